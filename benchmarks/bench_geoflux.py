@@ -0,0 +1,153 @@
+"""Time the GeoFlux hot paths and compare against a stored baseline.
+
+    python benchmarks/bench_geoflux.py --output bench.json
+    python benchmarks/bench_geoflux.py --compare bench.json --sizes 100 1000
+
+Every result is the best of --repeat runs, reported in seconds and in
+families x steps (or families x calls) per second.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import shapely
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.GeoFlux.catalog import BoundaryCatalog  # noqa: E402
+from src.GeoFlux.city import City  # noqa: E402
+from src.GeoFlux.render import Renderer  # noqa: E402
+from src.GeoFlux.stochastic_vector_field import StochasticVectorField2D  # noqa: E402
+
+SHAPEFILE = os.path.join(ROOT, "ex_gis", "cb_2018_us_csa_500k.shp")
+SIZES = (100, 1000, 10000, 100000)
+# Above this many families the exact all-pairs step is replaced by Barnes-Hut.
+EXACT_LIMIT = 5000
+
+
+def best_of(repeat, setup, run):
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def default_cities(catalog):
+    """The simplest, a median and the most detailed boundary by vertex count."""
+    names, vertices = catalog.names(), catalog.vertices()
+    order = np.argsort(vertices)
+    return [names[i] for i in (order[0], order[len(order) // 2], order[-1])]
+
+
+def bench_city(name, boundary, families, repeat, seed):
+    wp = int(families * 0.9)
+    bp = families - wp
+    theta = None if families <= EXACT_LIMIT else 0.5
+    engine = "exact" if theta is None else "barnes_hut"
+
+    def populated():
+        city = City(wp, bp, boundary, seed=seed, theta=theta)
+        city.populate()
+        return city
+
+    def sample_points(_=None):
+        rng = np.random.default_rng(seed)
+        x0, y0, x1, y1 = boundary.bounds
+        return rng.uniform(x0, x1, families), rng.uniform(y0, y1, families)
+
+    def render_setup():
+        city = populated()
+        return city, Renderer(boundary, name, city.population.groups)
+
+    def render(state):
+        city, renderer = state
+        renderer.update(city.population, 0)
+        renderer.frame()
+        renderer.close()
+
+    results = {
+        "populate": best_of(repeat, lambda: City(wp, bp, boundary, seed=seed), lambda city: city.populate()),
+        "step": best_of(repeat, populated, lambda city: city.step()),
+        "compute_vector": best_of(
+            repeat, populated, lambda city: StochasticVectorField2D(city, city.families["w0"]).compute_vector()),
+        "keep_within_bounds": best_of(
+            repeat, lambda: (populated(), sample_points()), lambda state: state[0].keep_within_bounds(*state[1])),
+        "plot_grid": best_of(repeat, render_setup, render),
+    }
+    # compute_vector evaluates one family against all others.
+    work = {"compute_vector": families}
+    return [
+        {"city": name, "vertices": int(shapely.get_num_coordinates(boundary)), "families": families,
+         "benchmark": benchmark, "engine": engine if benchmark in ("step", "compute_vector") else None,
+         "seconds": seconds,
+         "families_steps_per_second": work.get(benchmark, families) / seconds if seconds > 0 else None}
+        for benchmark, seconds in results.items()
+    ]
+
+
+def compare(results, baseline, tolerance):
+    """Print the speed ratio to the baseline for every matching result to stderr; return the regressions."""
+    key = lambda r: (r["city"], r["families"], r["benchmark"])  # noqa: E731
+    old = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        previous = old.get(key(result))
+        if previous is None:
+            continue
+        ratio = previous["seconds"] / result["seconds"] if result["seconds"] > 0 else float("inf")
+        flag = ""
+        if ratio < 1 - tolerance:
+            flag = "  REGRESSION"
+            regressions.append(result)
+        print(f"{result['benchmark']:>20} {result['families']:>7} {result['city'][:32]:<32} {ratio:6.2f}x{flag}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--cities", nargs="+", help="CSA names (default: simplest, median and most detailed)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed slowdown before flagging (fraction)")
+    args = parser.parse_args(argv)
+
+    catalog = BoundaryCatalog.open(SHAPEFILE)
+    results = []
+    for name in args.cities or default_cities(catalog):
+        boundary = catalog.geometry(name)
+        for families in args.sizes:
+            results += bench_city(name, boundary, families, args.repeat, args.seed)
+            print(f"{name[:40]:<40} {families:>7} done", file=sys.stderr)
+
+    report = {
+        "meta": {"python": platform.python_version(), "numpy": np.__version__, "shapely": shapely.__version__,
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "time": time.time()},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
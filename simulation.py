@@ -1,9 +1,14 @@
-import geopandas as gpd
 import streamlit as st
 from shapely.geometry import Point, Polygon
 from matplotlib.patches import Polygon as mpl_polygon
 import matplotlib.pyplot as plt
+from src.GeoFlux.boundary import CityBoundary
+from src.GeoFlux.cache import ResultCache
+from src.GeoFlux.catalog import BoundaryCatalog
 from src.GeoFlux.city import City
+from src.GeoFlux.profiling import PHASES
+from src.GeoFlux.render import Renderer
+from src.GeoFlux.runner import SimulationRun
 import numpy as np
 #import plotly.graph_objects as go
 
@@ -15,34 +20,120 @@ st.text("Test the simulation by selecting a city and adjusting the parameters to
 #drawn_boundary = st.sidebar.checkbox("Draw City Boundary")
 
 shapefile_path = "ex_gis/cb_2018_us_csa_500k.shp"
-gdf = gpd.read_file(shapefile_path)
-city_names = gdf['NAME'].tolist()
+
+
+@st.cache_resource
+def load_catalog(path):
+    return BoundaryCatalog.open(path)
+
+
+@st.cache_resource
+def load_cache(directory):
+    # Shared by every session; repeated parameters replay cached steps.
+    return ResultCache(directory)
+
+
+@st.cache_resource(max_entries=4)
+def load_boundary(name, tolerance, resolution):
+    # A fine BoundaryField takes seconds to build; share it between runs.
+    return CityBoundary(catalog.geometry(name, tolerance), resolution)
+
+
+catalog = load_catalog(shapefile_path)
+cache = load_cache(".geoflux_cache")
+city_names = catalog.names()
 city_name = st.sidebar.selectbox("City Name", city_names)
-city_num = city_names.index(city_name)
-city_boundary = gdf.geometry.iloc[city_num]
+tolerance = st.sidebar.selectbox("Boundary Simplification (degrees)", catalog.tolerances)
+city_boundary = catalog.geometry(city_name, tolerance)
 
 white_population = st.sidebar.slider("Majority Population", min_value=100, max_value=1000, value=400)
 black_population = st.sidebar.slider("Minority Population", min_value=10, max_value=200, value=20)
 min_distance = st.sidebar.slider("Min Distance", min_value=0.0, max_value=2.0, value=0.1)
+exclusion = st.sidebar.selectbox("Min Distance Policy", ["off", "reject", "shorten"])
+update = st.sidebar.selectbox("Update Order", ["sequential", "synchronous"])
+boundary_resolution = st.sidebar.selectbox("Boundary Raster (cells)", ["off", 256, 512, 1024])
 max_step_size = st.sidebar.slider("Max Step Size", min_value=0.01, max_value=1.0, value=0.1)
 steps = st.sidebar.slider("Simulation Steps", min_value=1, max_value=50, value=10)
+distribution = st.sidebar.selectbox("Initial Distribution", ["box", "gaussian", "polygon"])
+render_mode = st.sidebar.selectbox("Rendering", ["scatter", "density"])
+seed = st.sidebar.number_input("Seed", min_value=0, value=0, step=1)
+profile = st.sidebar.checkbox("Profile Steps")
+
+
+def start_run():
+    """Cancel the current run, if any, and start a new one from the sidebar parameters."""
+    previous = st.session_state.get("run")
+    if previous is not None:
+        previous.cancel()
+    boundary = load_boundary(city_name, tolerance, None if boundary_resolution == "off" else boundary_resolution)
+    city = City(white_population, black_population, boundary, min_distance, max_step_size, seed=int(seed),
+                exclusion=None if exclusion == "off" else exclusion, update=update)
+    key = cache.populate(city, distribution)
+    city.track_metrics()
+    if profile:
+        city.profile()
+    run = SimulationRun(city, Renderer(city_boundary, city_name, city.population.groups, mode=render_mode),
+                        cache, key)
+    st.session_state["run"] = run
+    st.session_state["run_name"] = city_name
+    run.run(steps)
+
+
+#if drawn_boundary:
+# using the mouse to draw the boundary of the city
+    #st.write("Draw the boundary of the city on the map")
+    #st.map(city_boundary)
+    #st.write("Click on the map to draw the boundary of the city")
+    #city_boundary = st.map.draw_polyline()
+    #city_boundary = Polygon(city_boundary)
+    #city.city_boundary = city_boundary
+
+run = st.session_state.get("run")
+start, more, cancel = st.columns(3)
+if start.button("Run Simulation"):
+    start_run()
+    run = st.session_state["run"]
+if more.button(f"Run {steps} More Steps", disabled=run is None or run.cancelled):
+    run.run(steps)
+if cancel.button("Cancel", disabled=run is None or not run.running):
+    run.cancel()
+
+
+def show_run(run, poll):
+    frame, done, target, running = run.snapshot()
+    if running:
+        st.progress(done / target if target else 1.0, text=f"Step {done} of {target}")
+    if frame is not None:
+        st.image(frame, caption=f"{st.session_state['run_name']}, step {done}")
+    records = list(run.city.metrics.records)
+    if len(records) > 1:
+        st.line_chart({column: [row[column] for row in records]
+                       for column in records[0] if column.startswith(("dissimilarity", "isolation"))})
+    if run.error is not None:
+        st.error(f"The run stopped: {run.error!r}")
+    # The polling fragment hands over to a full rerun once the worker is done,
+    # so the finished page stops polling.
+    if poll and not running:
+        st.rerun()
+
+
+if run is not None:
+    running = run.running
+    # While the worker runs, only this fragment refreshes; the sidebar stays
+    # responsive and a rerun of the page does not touch the worker.
+    st.fragment(show_run, run_every=0.5 if running else None)(run, running)
+
+    if not running and run.frames:
+        animation = run.animation()
+        st.image(animation, caption=f"{st.session_state['run_name']}, {run.city.step_count} steps")
+        st.download_button("Download Animation", animation, file_name="geoflux.gif", mime="image/gif")
 
-if st.button("Run Simulation"):
-    city = City(white_population, black_population, city_boundary, min_distance, max_step_size)
-    city.populate()
-    city.plot_grid("Initial", city_name)
-
-    #if drawn_boundary:
-    # using the mouse to draw the boundary of the city
-        #st.write("Draw the boundary of the city on the map")
-        #st.map(city_boundary)
-        #st.write("Click on the map to draw the boundary of the city")
-        #city_boundary = st.map.draw_polyline()
-        #city_boundary = Polygon(city_boundary)
-        #city.city_boundary = city_boundary
-
-    for _ in range(steps):
-        city.step()
-        city.plot_grid(_ + 1, city_name)
-
-    city.plot_grid("Final", city_name)
+        profiler = run.city.profiler
+        if profiler is not None and profiler.records:
+            with st.expander("Profiling", expanded=False):
+                totals = profiler.totals()
+                st.write(f"{totals['seconds']:.3f} s stepping, {totals['render']:.3f} s rendering, "
+                         f"{totals['escapes']} boundary escapes, {totals['projections']} projections, "
+                         f"{totals['clamped']} clamped steps")
+                st.bar_chart({phase: [totals[phase]] for phase in PHASES})
+                st.dataframe(profiler.records)
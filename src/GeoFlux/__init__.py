@@ -0,0 +1,12 @@
+"""Headless GeoFlux simulation core.
+
+Importing the package loads only NumPy and Shapely; matplotlib, Streamlit,
+pyarrow and geopandas are imported when rendering or loading boundaries.
+"""
+from .boundary import CityBoundary
+from .city import City
+from .population import GROUPS, Population
+from .stochastic_vector_field import ForceRules
+from .trajectory import load_checkpoint
+
+__all__ = ["City", "CityBoundary", "ForceRules", "GROUPS", "Population", "load_checkpoint"]
@@ -0,0 +1,158 @@
+"""Command line runs of the simulation without Streamlit, from the repository root.
+
+    python -m src.GeoFlux run --city "Midland-Odessa, TX" --steps 20 --output midland.csv
+    python -m src.GeoFlux batch --steps 20 --workers 8 --output all_csas.csv
+    python -m src.GeoFlux cities
+
+With src on PYTHONPATH the package is also runnable as python -m GeoFlux.
+
+For run, the output format follows the extension: .csv or .npz writes the
+segregation metrics, .gif, .mp4 or .png the rendered frames, and .pkl a
+checkpoint of the final city.  batch appends one row of metrics per CSA
+to a CSV as each run finishes.
+"""
+import argparse
+import os
+import sys
+import time
+
+SHAPEFILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                         "ex_gis", "cb_2018_us_csa_500k.shp")
+METRICS = (".csv", ".npz")
+ANIMATIONS = (".gif", ".mp4", ".png")
+CHECKPOINTS = (".pkl",)
+
+
+def load_boundary(shapefile, name, tolerance=0.0):
+    from .catalog import BoundaryCatalog
+
+    catalog = BoundaryCatalog.open(shapefile)
+    if name not in catalog.names():
+        raise SystemExit(f"unknown city {name!r}; list them with: python -m GeoFlux cities")
+    return catalog.geometry(name, tolerance)
+
+
+def city_kwargs(args):
+    return {"min_distance": args.min_distance, "max_step_size": args.max_step_size, "cutoff": args.cutoff,
+            "theta": args.theta, "workers": args.workers, "seed": args.seed, "exclusion": args.exclusion,
+            "update": args.update, "boundary_resolution": args.boundary_resolution}
+
+
+def run(args):
+    from .city import City
+
+    extension = os.path.splitext(args.output)[1].lower() if args.output else ""
+    if args.output and extension not in METRICS + ANIMATIONS + CHECKPOINTS:
+        raise SystemExit(f"cannot write {args.output!r}, use one of {', '.join(METRICS + ANIMATIONS + CHECKPOINTS)}")
+
+    boundary = load_boundary(args.shapefile, args.city, args.tolerance)
+    start = time.perf_counter()
+    with City(args.white, args.black, boundary, **city_kwargs(args)) as city:
+        city.populate(args.distribution)
+        if extension in METRICS:
+            city.track_metrics()
+        renderer, frames = None, []
+        if extension in ANIMATIONS:
+            from .render import Renderer
+
+            renderer = Renderer(boundary, args.city, city.population.groups, mode=args.render)
+            renderer.update(city.population, "Initial")
+            frames.append(renderer.frame())
+
+        for step in range(args.steps):
+            city.step()
+            if renderer is not None:
+                renderer.update(city.population, step + 1)
+                frames.append(renderer.frame())
+        elapsed = time.perf_counter() - start
+
+        if extension == ".csv":
+            city.metrics.to_csv(args.output)
+        elif extension == ".npz":
+            city.metrics.to_npz(args.output)
+        elif extension in ANIMATIONS:
+            from .render import save_animation
+
+            save_animation(frames, args.output)
+            renderer.close()
+        elif extension in CHECKPOINTS:
+            city.save_checkpoint(args.output)
+
+    families = len(city.population)
+    print(f"{args.city}: {families} families, {args.steps} steps in {elapsed:.2f} s "
+          f"({families * args.steps / elapsed if elapsed > 0 else float('inf'):.0f} families x steps/s)",
+          file=sys.stderr)
+
+
+def batch(args):
+    from .batch import run_batch
+    from .catalog import BoundaryCatalog
+
+    kwargs = city_kwargs(args)
+    # Parallelism comes from running CSAs side by side.
+    workers, kwargs["workers"] = kwargs.pop("workers"), None
+    del kwargs["seed"]
+    start = time.perf_counter()
+
+    def report(row):
+        status = row["error"] or f"{row['seconds']:.2f} s"
+        print(f"{row['name']}: {status}", file=sys.stderr)
+
+    rows = run_batch(BoundaryCatalog.open(args.shapefile), args.output, args.white, args.black, args.steps, args.seed,
+                     args.names, args.tolerance, workers, kwargs, args.distribution, on_result=report)
+    failed = sum(1 for row in rows if row["error"])
+    print(f"{len(rows)} CSAs in {time.perf_counter() - start:.1f} s, {failed} failed, results in {args.output}",
+          file=sys.stderr)
+
+
+def cities(args):
+    from .catalog import BoundaryCatalog
+
+    catalog = BoundaryCatalog.open(args.shapefile)
+    for name, vertices in zip(catalog.names(), catalog.vertices()):
+        print(f"{name}\t{vertices}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.GeoFlux", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shapefile", default=SHAPEFILE, help="CSA shapefile (default: the bundled 2018 CSAs)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    listing = commands.add_parser("cities", help="list the CSA names and their vertex counts")
+    listing.set_defaults(func=cities)
+
+    scenario = argparse.ArgumentParser(add_help=False)
+    scenario.add_argument("--tolerance", type=float, default=0.0, help="boundary simplification in degrees")
+    scenario.add_argument("--white", type=int, default=400, help="majority families")
+    scenario.add_argument("--black", type=int, default=20, help="minority families")
+    scenario.add_argument("--steps", type=int, default=10)
+    scenario.add_argument("--seed", type=int, default=0)
+    scenario.add_argument("--distribution", default="box", choices=("box", "gaussian", "polygon"))
+    scenario.add_argument("--min-distance", type=float, default=0.1)
+    scenario.add_argument("--exclusion", choices=("reject", "shorten"))
+    scenario.add_argument("--max-step-size", type=float, default=0.1)
+    scenario.add_argument("--cutoff", type=float)
+    scenario.add_argument("--theta", type=float)
+    scenario.add_argument("--workers", type=int)
+    scenario.add_argument("--update", default="sequential", choices=("sequential", "synchronous"))
+    scenario.add_argument("--boundary-resolution", type=int,
+                          help="rasterize the boundary with this many cells along its longer side")
+
+    simulate = commands.add_parser("run", parents=[scenario], help="simulate one city")
+    simulate.add_argument("--city", required=True, help="CSA name, as listed by the cities command")
+    simulate.add_argument("--output", help="metrics (.csv, .npz), animation (.gif, .mp4, .png) or checkpoint (.pkl)")
+    simulate.add_argument("--render", default="scatter", choices=("scatter", "density"))
+    simulate.set_defaults(func=run)
+
+    every = commands.add_parser("batch", parents=[scenario], help="simulate every CSA on a process pool")
+    every.add_argument("--output", required=True, help="CSV of per-CSA results, resumed if it exists")
+    every.add_argument("--names", nargs="+", help="only these CSAs")
+    every.set_defaults(func=batch)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import numpy as np
+
+MAX_DEPTH = 16
+
+
+def _spread_bits(v):
+    v = v.astype(np.uint64)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x33333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x55555555)
+    return v
+
+
+def _ranges(starts, counts):
+    """Concatenate ``range(s, s + c)`` for every start/count pair."""
+    total = counts.sum()
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + (np.arange(total) - offsets)
+
+
+class _Level:
+    pass
+
+
+class BarnesHutTree:
+    """Quadtree over family positions with per-group mass and center of mass per cell.
+
+    Families are sorted by Morton key, so every cell owns a contiguous slice of
+    the sorted arrays and each level of the tree is a set of flat arrays.
+    """
+
+    def __init__(self, x, y, codes, groups=2, leaf_size=16, max_depth=MAX_DEPTH):
+        self.groups = groups
+        self.leaf_size = leaf_size
+        self.size = len(x)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        self.x0 = x.min() if len(x) else 0.0
+        self.y0 = y.min() if len(y) else 0.0
+        span = max(np.ptp(x), np.ptp(y)) if len(x) else 0.0
+        self.span = span * (1 + 1e-9) if span > 0 else 1.0
+
+        cells = 1 << max_depth
+        ix = np.clip(((x - self.x0) / self.span * cells).astype(np.int64), 0, cells - 1)
+        iy = np.clip(((y - self.y0) / self.span * cells).astype(np.int64), 0, cells - 1)
+        keys = _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+
+        self.order = np.argsort(keys, kind="stable")
+        keys = keys[self.order]
+        self.x = x[self.order]
+        self.y = y[self.order]
+        self.codes = np.asarray(codes)[self.order]
+        ix, iy = ix[self.order], iy[self.order]
+
+        self.levels = []
+        for depth in range(max_depth + 1):
+            shift = np.uint64(2 * (max_depth - depth))
+            prefix = keys >> shift
+            start = np.flatnonzero(np.r_[True, prefix[1:] != prefix[:-1]]) if self.size else np.zeros(0, int)
+            level = _Level()
+            level.prefix = prefix[start]
+            level.start = start
+            level.count = np.diff(np.r_[start, self.size])
+            level.width = self.span / (1 << depth)
+            level.ix = ix[start] >> (max_depth - depth)
+            level.iy = iy[start] >> (max_depth - depth)
+
+            level.mass = np.zeros((groups, len(start)))
+            level.comx = np.zeros((groups, len(start)))
+            level.comy = np.zeros((groups, len(start)))
+            for group in range(groups):
+                member = (self.codes == group).astype(float)
+                if len(start):
+                    level.mass[group] = np.add.reduceat(member, start)
+                    level.comx[group] = np.add.reduceat(member * self.x, start)
+                    level.comy[group] = np.add.reduceat(member * self.y, start)
+            total = level.mass.sum(axis=0)
+            level.allx = level.comx.sum(axis=0) / np.maximum(total, 1)
+            level.ally = level.comy.sum(axis=0) / np.maximum(total, 1)
+            occupied = level.mass > 0
+            level.comx = np.divide(level.comx, level.mass, out=np.zeros_like(level.comx), where=occupied)
+            level.comy = np.divide(level.comy, level.mass, out=np.zeros_like(level.comy), where=occupied)
+
+            if self.levels:
+                parent = self.levels[-1]
+                parents = level.prefix >> np.uint64(2)
+                parent.child_start = np.searchsorted(parents, parent.prefix, side="left")
+                parent.child_count = np.searchsorted(parents, parent.prefix, side="right") - parent.child_start
+            self.levels.append(level)
+            self.depth = depth
+            if not len(start) or level.count.max() <= leaf_size:
+                break
+
+    def forces(self, tx, ty, tcodes, interaction, theta=0.5, block=4096):
+        """Neighbor forces on the targets and their count of non-coincident neighbors.
+
+        A cell is treated as one body per group, at that group's center of mass,
+        when its width is below ``theta`` times its distance from the target and
+        the target lies outside it.
+        """
+        force = np.zeros((len(tx), 2))
+        coincident = np.zeros(len(tx), dtype=np.int64)
+        for first in range(0, len(tx), block):
+            last = min(first + block, len(tx))
+            f, c = self._block_forces(tx[first:last], ty[first:last], tcodes[first:last], interaction, theta)
+            force[first:last] = f
+            coincident[first:last] = c
+        return force, self.size - coincident
+
+    def _block_forces(self, tx, ty, tcodes, interaction, theta):
+        n = len(tx)
+        fx = np.zeros(n)
+        fy = np.zeros(n)
+        coincident = np.zeros(n, dtype=np.int64)
+        if not self.size or not n:
+            return np.column_stack((fx, fy)), coincident
+
+        ux = (tx - self.x0) / self.span
+        uy = (ty - self.y0) / self.span
+        target = np.arange(n)
+        node = np.zeros(n, dtype=np.int64)
+
+        for depth, level in enumerate(self.levels):
+            if not len(target):
+                break
+            px, py = tx[target], ty[target]
+            distance = np.hypot(level.allx[node] - px, level.ally[node] - py)
+            cells = 1 << depth
+            inside = ((np.floor(ux[target] * cells) == level.ix[node])
+                      & (np.floor(uy[target] * cells) == level.iy[node]))
+            accept = ~inside & (level.width < theta * distance)
+
+            # Far cells: one body per group at the group's center of mass.
+            at, an = target[accept], node[accept]
+            for group in range(self.groups):
+                mass = level.mass[group, an]
+                dx = level.comx[group, an] - tx[at]
+                dy = level.comy[group, an] - ty[at]
+                d2 = dx * dx + dy * dy
+                d = np.sqrt(d2)
+                coef = interaction[tcodes[at], group] * mass
+                weight = np.divide(coef, d * (d2 + 1e-6), out=np.zeros_like(d2), where=(mass > 0) & (d > 0))
+                fx += np.bincount(at, weight * dx, minlength=n)
+                fy += np.bincount(at, weight * dy, minlength=n)
+
+            leaf = ~accept & ((level.count[node] <= self.leaf_size) | (depth == self.depth))
+
+            # Near leaves: exact pairwise sum over their families.
+            lt, ln = target[leaf], node[leaf]
+            counts = level.count[ln]
+            pt = np.repeat(lt, counts)
+            ps = _ranges(level.start[ln], counts)
+            dx = self.x[ps] - tx[pt]
+            dy = self.y[ps] - ty[pt]
+            d2 = dx * dx + dy * dy
+            d = np.sqrt(d2)
+            apart = d > 0
+            coef = interaction[tcodes[pt], self.codes[ps]]
+            weight = np.divide(coef, d * (d2 + 1e-6), out=np.zeros_like(d2), where=apart)
+            fx += np.bincount(pt, weight * dx, minlength=n)
+            fy += np.bincount(pt, weight * dy, minlength=n)
+            coincident += np.bincount(pt[~apart], minlength=n)
+
+            opened = ~accept & ~leaf
+            if depth == self.depth or not opened.any():
+                break
+            ot, on = target[opened], node[opened]
+            counts = level.child_count[on]
+            target = np.repeat(ot, counts)
+            node = _ranges(level.child_start[on], counts)
+
+        return np.column_stack((fx, fy)), coincident
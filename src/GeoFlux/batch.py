@@ -0,0 +1,126 @@
+import csv
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import shapely
+from .city import City
+
+BASE_COLUMNS = ["name", "vertices", "families", "steps", "seed", "seconds", "families_steps_per_second", "error"]
+
+
+def run_city(name, boundary_wkb, populations, steps, seed, city_kwargs=None, distribution="box", cell_size=0.01):
+    """Run one CSA and return a row of its final segregation metrics, or of the error it raised."""
+    geometry = shapely.from_wkb(boundary_wkb)
+    row = {"name": name, "vertices": int(shapely.get_num_coordinates(geometry)),
+           "families": sum(populations.values()), "steps": steps, "seed": seed, "error": ""}
+    start = time.perf_counter()
+    try:
+        with City(None, None, geometry, seed=seed, populations=populations, **(city_kwargs or {})) as city:
+            city.populate(distribution)
+            metrics = city.track_metrics(cell_size)
+            for _ in range(steps):
+                city.step()
+    except Exception:
+        row["error"] = traceback.format_exc(limit=-1).strip().splitlines()[-1]
+        return row
+    row["seconds"] = time.perf_counter() - start
+    row["families_steps_per_second"] = row["families"] * steps / row["seconds"] if row["seconds"] > 0 else None
+    initial, final = metrics.records[0], metrics.records[-1]
+    for column, value in final.items():
+        if column != "step":
+            row[column] = value
+            row[f"initial_{column}"] = initial[column]
+    return row
+
+
+def _finished(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as f:
+        return {row["name"] for row in csv.DictReader(f) if not row.get("error")}
+
+
+class _ResultTable:
+    """CSV that rows are appended to as runs finish; the header is fixed by the first successful row."""
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        self.pending = []
+        resume = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "a" if resume else "w", newline="")
+        if resume:
+            with open(path, newline="") as f:
+                self._open(next(csv.reader(f)))
+
+    def _open(self, columns):
+        self.writer = csv.DictWriter(self.file, fieldnames=columns, restval="", extrasaction="ignore")
+
+    def append(self, row):
+        if self.writer is None:
+            if row["error"]:
+                self.pending.append(row)
+                return
+            metrics = [column for column in row if column not in BASE_COLUMNS]
+            self._open(BASE_COLUMNS + metrics)
+            self.writer.writeheader()
+        for waiting in self.pending + [row]:
+            self.writer.writerow(waiting)
+        self.pending = []
+        self.file.flush()
+
+    def close(self):
+        if self.writer is None and self.pending:
+            self._open(BASE_COLUMNS)
+            self.writer.writeheader()
+            self.writer.writerows(self.pending)
+        self.file.close()
+
+
+def run_batch(catalog, output, wp=400, bp=20, steps=10, seed=0, names=None, tolerance=0.0, workers=None,
+              city_kwargs=None, distribution="box", populations=None, on_result=None):
+    """Run the same scenario for every CSA in a BoundaryCatalog, appending a row per CSA to a CSV as it finishes.
+
+    Runs are submitted longest first (vertices x families) to balance the
+    pool, and each worker is sent only its own boundary as WKB.  CSAs that
+    already have a successful row in output are skipped, so an interrupted
+    batch resumes where it stopped.  Each CSA's seed depends only on seed
+    and its position in the catalog.
+    """
+    populations = populations or {"white": wp, "black": bp}
+    families = sum(populations.values())
+    all_names = catalog.names()
+    seeds = dict(zip(all_names, (int(child.generate_state(1)[0])
+                                 for child in np.random.SeedSequence(seed).spawn(len(all_names)))))
+    vertices = dict(zip(all_names, catalog.vertices()))
+    unknown = set(names or ()) - set(all_names)
+    if unknown:
+        raise ValueError(f"unknown CSAs {sorted(unknown)}")
+    done = _finished(output)
+    todo = [name for name in (names or all_names) if name not in done]
+    todo.sort(key=lambda name: vertices[name] * families, reverse=True)
+
+    table = _ResultTable(output)
+    rows = []
+    try:
+        def finish(row):
+            table.append(row)
+            rows.append(row)
+            if on_result is not None:
+                on_result(row)
+
+        args = [(name, catalog.wkb(name, tolerance), populations, steps, seeds[name], city_kwargs, distribution)
+                for name in todo]
+        workers = min(workers or os.cpu_count(), len(todo)) if todo else 1
+        if workers > 1:
+            with ProcessPoolExecutor(workers) as pool:
+                for future in as_completed([pool.submit(run_city, *a) for a in args]):
+                    finish(future.result())
+        else:
+            for a in args:
+                finish(run_city(*a))
+    finally:
+        table.close()
+    return rows
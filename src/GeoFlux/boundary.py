@@ -0,0 +1,256 @@
+import numpy as np
+import shapely
+
+
+DISTRIBUTIONS = ("box", "gaussian", "polygon")
+OUTSIDE, INSIDE, BORDER = 0, 1, 2
+# Cell centers per block of BoundaryField's tree queries.
+BUILD_CELLS = 1 << 16
+
+
+class BoundaryField:
+    """A raster over a city's bounds answering containment and projection by cell lookup.
+
+    The padded bounds are cut into square cells, resolution along the longer
+    side.  Each cell stores the signed distance from its center to the
+    boundary (negative inside) and every boundary segment that can be the
+    nearest one to a point in the cell.  A cell farther than half its
+    diagonal from the boundary lies wholly inside or outside, so the exact
+    polygon is only consulted in cells on the border, and projection only
+    compares a point with its cell's candidate segments.
+    """
+
+    def __init__(self, geometry, boundary, resolution=256, padding=0.1):
+        self.geometry = geometry
+        self.boundary = boundary
+        x0, y0, x1, y1 = geometry.bounds
+        extent = max(x1 - x0, y1 - y0)
+        self.cell = extent / resolution
+        pad = padding * extent
+        self.x0, self.y0 = x0 - pad, y0 - pad
+        self.nx = int(np.ceil((x1 - x0 + 2 * pad) / self.cell))
+        self.ny = int(np.ceil((y1 - y0 + 2 * pad) / self.cell))
+
+        # Boundary segments of every ring of every part.
+        coords, part = shapely.get_coordinates(shapely.get_parts(boundary), return_index=True)
+        same = part[1:] == part[:-1]
+        self.a, self.b = coords[:-1][same], coords[1:][same]
+        tree = shapely.STRtree(shapely.linestrings(np.stack((self.a, self.b), axis=1)))
+
+        cy = self.y0 + (np.arange(self.ny) + 0.5) * self.cell
+        half = self.cell * np.sqrt(0.5)
+        self.distance = np.empty((self.nx, self.ny))
+        self.state = np.empty(self.nx * self.ny, dtype=np.int8)
+        candidates, counts = [], []
+        # Columns of cells in blocks of about BUILD_CELLS, to bound the
+        # memory of the tree queries.
+        columns = max(1, BUILD_CELLS // self.ny)
+        for start in range(0, self.nx, columns):
+            stop = min(start + columns, self.nx)
+            cx = self.x0 + (np.arange(start, stop) + 0.5) * self.cell
+            gx, gy = (g.ravel() for g in np.meshgrid(cx, cy, indexing="ij"))
+            centers = shapely.points(gx, gy)
+            _, distance = tree.query_nearest(centers, return_distance=True, all_matches=False)
+            inside = shapely.contains_xy(geometry, gx, gy)
+            self.distance[start:stop] = np.where(inside, -distance, distance).reshape(stop - start, self.ny)
+            self.state[start * self.ny:stop * self.ny] = np.where(distance <= half, BORDER,
+                                                                  np.where(inside, INSIDE, OUTSIDE))
+
+            # A point within half a diagonal of the center is at most distance +
+            # half from the boundary, so its nearest segment is within distance +
+            # 2 * half of the center.
+            owner, segment = tree.query(centers, predicate="dwithin", distance=distance + 2 * half)
+            candidates.append(segment[np.argsort(owner, kind="stable")].astype(np.int32))
+            counts.append(np.bincount(owner, minlength=len(gx)))
+        self.candidates = np.concatenate(candidates)
+        self.starts = np.concatenate(([0], np.cumsum(np.concatenate(counts))))
+
+    def gradient(self):
+        """Gradient of the signed distance grid, as (d/dx, d/dy) arrays of shape (nx, ny)."""
+        return np.gradient(self.distance, self.cell)
+
+    def cells(self, x, y):
+        """Flat cell index of each point, and whether it lies on the grid at all."""
+        i = np.floor((x - self.x0) / self.cell).astype(np.int64)
+        j = np.floor((y - self.y0) / self.cell).astype(np.int64)
+        on_grid = (i >= 0) & (i < self.nx) & (j >= 0) & (j < self.ny)
+        return np.where(on_grid, i * self.ny + j, 0), on_grid
+
+    def _cell(self, x, y):
+        """Flat cell index of one point, or -1 off the grid."""
+        i, j = int((x - self.x0) // self.cell), int((y - self.y0) // self.cell)
+        return i * self.ny + j if 0 <= i < self.nx and 0 <= j < self.ny else -1
+
+    def contains(self, x, y):
+        scalar = np.ndim(x) == 0
+        if scalar:
+            cell = self._cell(x, y)
+            state = self.state.flat[cell] if cell >= 0 else OUTSIDE
+            return state == INSIDE or state == BORDER and bool(shapely.contains_xy(self.geometry, x, y))
+        x, y = np.atleast_1d(x), np.atleast_1d(y)
+        cell, on_grid = self.cells(x, y)
+        state = np.where(on_grid, self.state[cell], OUTSIDE)
+        result = state == INSIDE
+        border = state == BORDER
+        if border.any():
+            result[border] = shapely.contains_xy(self.geometry, x[border], y[border])
+        return bool(result[0]) if scalar else result
+
+    def project(self, x, y):
+        """Nearest points on the boundary, from each point's candidate segments."""
+        scalar = np.ndim(x) == 0
+        if scalar and self._cell(x, y) >= 0:
+            cell = self._cell(x, y)
+            segment = self.candidates[self.starts[cell]:self.starts[cell + 1]]
+            a, ab = self.a[segment], self.b[segment] - self.a[segment]
+            ap = np.array((x, y)) - a
+            length2 = (ab * ab).sum(axis=1)
+            t = np.clip(np.divide((ap * ab).sum(axis=1), length2, out=np.zeros_like(length2), where=length2 > 0),
+                        0, 1)
+            k = int(np.argmin(((ap - t[:, None] * ab) ** 2).sum(axis=1)))
+            return a[k, 0] + t[k] * ab[k, 0], a[k, 1] + t[k] * ab[k, 1]
+        x, y = np.atleast_1d(np.asarray(x, dtype=float)), np.atleast_1d(np.asarray(y, dtype=float))
+        px, py = x.copy(), y.copy()
+        cell, on_grid = self.cells(x, y)
+        if not on_grid.all():
+            # Far outside the padded bounds: fall back to the exact geometry.
+            lines = shapely.shortest_line(shapely.points(x[~on_grid], y[~on_grid]), self.boundary)
+            end = shapely.get_coordinates(lines).reshape(-1, 2, 2)[:, 1]
+            px[~on_grid], py[~on_grid] = end[:, 0], end[:, 1]
+
+        points = np.flatnonzero(on_grid)
+        if len(points):
+            cell = cell[points]
+            counts = self.starts[cell + 1] - self.starts[cell]
+            owner = np.repeat(np.arange(len(points)), counts)
+            local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            segment = self.candidates[np.repeat(self.starts[cell], counts) + local]
+
+            a, b = self.a[segment], self.b[segment]
+            ab = b - a
+            ap = np.column_stack((x[points][owner], y[points][owner])) - a
+            length2 = (ab * ab).sum(axis=1)
+            t = np.clip(np.divide((ap * ab).sum(axis=1), length2, out=np.zeros_like(length2), where=length2 > 0),
+                        0, 1)
+            nearest = a + t[:, None] * ab
+            d2 = ((ap - t[:, None] * ab) ** 2).sum(axis=1)
+            # Candidates are grouped by point; keep the first closest one of each.
+            hit = np.flatnonzero(d2 == np.minimum.reduceat(d2, np.cumsum(counts) - counts)[owner])
+            first = np.empty(len(points), dtype=np.int64)
+            first[owner[hit[::-1]]] = hit[::-1]
+            px[points], py[points] = nearest[first, 0], nearest[first, 1]
+        if scalar:
+            return px[0], py[0]
+        return px, py
+
+
+class CityBoundary:
+    """A city polygon prepared once for repeated containment and projection queries.
+
+    With a resolution, containment and projection go through a
+    BoundaryField of that many cells along the longer side, so their cost
+    no longer grows with the number of vertices.  Building a fine field
+    takes seconds, so one CityBoundary may be shared by several cities.
+    """
+
+    def __init__(self, geometry, resolution=None):
+        self.geometry = geometry
+        shapely.prepare(geometry)
+        centroid = geometry.centroid
+        self.center = (centroid.x, centroid.y)
+        self.bounds = geometry.bounds
+        self.boundary = geometry.boundary
+        shapely.prepare(self.boundary)
+        self._triangles = None
+        self.resolution = resolution or None
+        self.field = BoundaryField(geometry, self.boundary, resolution) if resolution else None
+
+    def contains(self, x, y):
+        if self.field is not None:
+            return self.field.contains(x, y)
+        return shapely.contains_xy(self.geometry, x, y)
+
+    def project(self, x, y):
+        """Nearest points on the boundary line to each (x, y)."""
+        if self.field is not None:
+            return self.field.project(x, y)
+        lines = shapely.shortest_line(shapely.points(x, y), self.boundary)
+        end = shapely.get_coordinates(lines).reshape(-1, 2, 2)[:, 1]
+        if np.ndim(x) == 0:
+            return end[0, 0], end[0, 1]
+        return end[:, 0], end[:, 1]
+
+    def keep_within(self, x, y, profiler=None):
+        """Return the positions with every point outside the city moved onto its boundary.
+
+        The boundary may be shared by several cities, so escapes and
+        project() calls (a batch counts once) are counted on the caller's
+        profiler rather than here.
+        """
+        if np.ndim(x) == 0:
+            if self.contains(x, y):
+                return x, y
+            if profiler is not None:
+                profiler.count("escapes")
+                profiler.count("projections")
+            return self.project(x, y)
+
+        x = np.array(x, dtype=float)
+        y = np.array(y, dtype=float)
+        escaped = ~self.contains(x, y)
+        n = int(np.count_nonzero(escaped))
+        if n:
+            if profiler is not None:
+                profiler.count("escapes", n)
+                profiler.count("projections")
+            x[escaped], y[escaped] = self.project(x[escaped], y[escaped])
+        return x, y
+
+    def triangles(self):
+        """Triangulation of the polygon as (n, 3, 2) vertices and (n,) areas."""
+        if self._triangles is None:
+            if hasattr(shapely, "constrained_delaunay_triangles"):
+                parts = shapely.get_parts(shapely.constrained_delaunay_triangles(self.geometry))
+            else:
+                parts = shapely.get_parts(shapely.delaunay_triangles(self.geometry))
+                parts = parts[shapely.contains_xy(self.geometry, *shapely.get_coordinates(shapely.centroid(parts)).T)]
+            vertices = shapely.get_coordinates(shapely.get_exterior_ring(parts)).reshape(-1, 4, 2)[:, :3]
+            self._triangles = vertices, shapely.area(parts)
+        return self._triangles
+
+    def candidates(self, n, distribution="box", spread=0.05, rng=None):
+        rng = rng or np.random.default_rng()
+        if distribution == "box":
+            cx, cy = self.center
+            return (cx + rng.uniform(-spread, spread, n),
+                    cy + rng.uniform(-spread, spread, n))
+        if distribution == "gaussian":
+            cx, cy = self.center
+            return cx + rng.normal(0, spread, n), cy + rng.normal(0, spread, n)
+        if distribution == "polygon":
+            vertices, areas = self.triangles()
+            chosen = vertices[rng.choice(len(areas), n, p=areas / areas.sum())]
+            u, v = rng.random(n), rng.random(n)
+            flip = u + v > 1
+            u[flip], v[flip] = 1 - u[flip], 1 - v[flip]
+            points = chosen[:, 0] + u[:, None] * (chosen[:, 1] - chosen[:, 0]) + v[:, None] * (chosen[:, 2] - chosen[:, 0])
+            return points[:, 0], points[:, 1]
+        raise ValueError(f"unknown distribution {distribution!r}, expected one of {DISTRIBUTIONS}")
+
+    def sample(self, n, distribution="box", spread=0.05, rng=None, max_rounds=1000):
+        """Draw n positions inside the city, rejecting candidates that fall outside it."""
+        xs, ys = [], []
+        found, rate = 0, 1.0
+        for _ in range(max_rounds):
+            if found >= n:
+                break
+            wanted = n - found
+            x, y = self.candidates(int(wanted / rate * 1.1) + 16, distribution, spread, rng)
+            inside = self.contains(x, y)
+            rate = max(inside.mean(), 1e-3)
+            xs.append(x[inside][:wanted])
+            ys.append(y[inside][:wanted])
+            found += len(xs[-1])
+        if found < n:
+            raise ValueError(f"could only place {found} of {n} families inside the city")
+        return np.concatenate(xs or [np.zeros(0)]), np.concatenate(ys or [np.zeros(0)])
@@ -0,0 +1,172 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import numpy as np
+import shapely
+from .population import Population
+from .storage import atomic_path, stable_hash
+
+
+def scenario_key(city, distribution="box", spread=0.05):
+    """Hash of everything that determines a seeded City's trajectory, or None for an unseeded one."""
+    if city.seed is None:
+        return None
+    rules = city.rules
+    settings = {
+        "populations": city.populations,
+        "min_distance": city.min_distance,
+        "max_step_size": city.max_step_size,
+        "cutoff": city.cutoff,
+        "theta": city.theta,
+        # The process pool reproduces the synchronous snapshot forces.
+        "parallel": city.workers is not None and city.workers > 1,
+        "update": city.update,
+        "exclusion": city.exclusion,
+        "boundary_resolution": city.boundary_resolution,
+        "seed": city.seed,
+        "dtype": city.population.dtype.str,
+        "distribution": distribution,
+        "spread": spread,
+        "groups": rules.groups,
+        "interaction": rules.interaction.tolist(),
+        "noise": np.asarray(rules.noise).tolist(),
+        "center_pull": np.asarray(rules.center_pull).tolist(),
+    }
+    return stable_hash(settings, shapely.to_wkb(city.city_boundary), length=24)
+
+
+class ResultCache:
+    """Per-step snapshots of seeded runs, in an LRU memory tier and an optional directory.
+
+    A snapshot holds the positions and RNG state after a step (step 0 is
+    the populated city, with its group codes and ids), which is all a City
+    needs to continue.  The memory tier keeps at most max_bytes of
+    positions and evicts the least recently used snapshots; the disk tier
+    keeps everything written to it.  One cache may be shared by runs on
+    several threads.
+    """
+
+    def __init__(self, directory=None, max_bytes=256 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, step):
+        return os.path.join(self.directory, key, f"{step:06d}.pkl")
+
+    def get(self, key, step):
+        if key is None:
+            return None
+        with self._lock:
+            snapshot = self.memory.get((key, step))
+            if snapshot is not None:
+                self._touch(key, step)
+            elif self.directory is not None and os.path.exists(self._path(key, step)):
+                with open(self._path(key, step), "rb") as f:
+                    snapshot = pickle.load(f)
+                self._remember(key, step, snapshot)
+            if snapshot is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return snapshot
+
+    def put(self, key, city):
+        """Store the current state of city as the snapshot of its step_count."""
+        if key is None:
+            return
+        population = city.population
+        snapshot = {"x": population.x.copy(), "y": population.y.copy(), "rng": city.rng.bit_generator.state}
+        if city.step_count == 0:
+            snapshot["population"] = population.state()
+        with self._lock:
+            self._remember(key, city.step_count, snapshot)
+        if self.directory is not None:
+            path = self._path(key, city.step_count)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_path(path) as tmp, open(tmp, "wb") as f:
+                pickle.dump(snapshot, f)
+
+    def _remember(self, key, step, snapshot):
+        previous = self.memory.pop((key, step), None)
+        if previous is not None:
+            self.nbytes -= previous["x"].nbytes * 2
+        self.memory[(key, step)] = snapshot
+        self._touch(key, step)
+        self.nbytes += snapshot["x"].nbytes * 2
+        while self.nbytes > self.max_bytes and len(self.memory) > 1:
+            _, evicted = self.memory.popitem(last=False)
+            self.nbytes -= evicted["x"].nbytes * 2
+
+    def _touch(self, key, step):
+        # Every later step needs step 0 (the group codes and ids) to be
+        # restored into a fresh City, so step 0 is kept as recent as them.
+        self.memory.move_to_end((key, step))
+        if step and (key, 0) in self.memory:
+            self.memory.move_to_end((key, 0))
+
+    def steps(self, key):
+        """Every step with a snapshot for key, in either tier."""
+        if key is None:
+            return set()
+        with self._lock:
+            found = {step for cached, step in self.memory if cached == key}
+        if self.directory is not None and os.path.isdir(os.path.join(self.directory, key)):
+            found.update(int(name[:-4]) for name in os.listdir(os.path.join(self.directory, key))
+                         if name.endswith(".pkl"))
+        return found
+
+    def restore(self, city, key, step):
+        """Move city to the cached state after step; False if there is none."""
+        snapshot = self.get(key, step)
+        if snapshot is None:
+            return False
+        if len(city.population) == 0:
+            initial = snapshot if step == 0 else self.get(key, 0)
+            if initial is None:
+                return False
+            city.population = Population.from_state(initial["population"])
+            city.families.population = city.population
+        city.population.x[:] = snapshot["x"]
+        city.population.y[:] = snapshot["y"]
+        city.rng.bit_generator.state = snapshot["rng"]
+        city.step_count = step
+        return True
+
+    def populate(self, city, distribution="box", spread=0.05):
+        """Populate city from the cache or from its seed; returns the scenario key for step()."""
+        key = scenario_key(city, distribution, spread)
+        if not self.restore(city, key, 0):
+            city.populate(distribution, spread)
+            self.put(key, city)
+        return key
+
+    def step(self, city, key):
+        """Advance city by one step, from the cache when possible; True on a cache hit."""
+        if self.restore(city, key, city.step_count + 1):
+            if city.metrics is not None:
+                city.metrics.record(city)
+            if city.trajectory is not None:
+                city.trajectory.append(city.population)
+            return True
+        city.step()
+        self.put(key, city)
+        return False
+
+    def run(self, city, steps, distribution="box", spread=0.05):
+        """A populated city after steps steps, resumed from the longest cached prefix of the run."""
+        key = scenario_key(city, distribution, spread)
+        prefix = max((step for step in self.steps(key) if step <= steps), default=None)
+        if prefix is None or not self.restore(city, key, prefix):
+            key = self.populate(city, distribution, spread)
+        while city.step_count < steps:
+            city.step()
+            self.put(key, city)
+        return city
@@ -0,0 +1,76 @@
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from .storage import atomic_path
+
+# Simplification tolerances (degrees) stored next to the exact geometry.
+TOLERANCES = (0.001, 0.005, 0.02)
+
+
+def _column(tolerance):
+    return "wkb" if not tolerance else f"wkb_{tolerance:g}"
+
+
+class BoundaryCatalog:
+    """CSA boundaries cached as WKB in a Parquet file with one row group per CSA.
+
+    Names are read without touching any geometry column, and a geometry is
+    fetched by reading a single row group.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = pq.ParquetFile(path)
+        self._names = None
+        self._index = None
+
+    @classmethod
+    def build(cls, shapefile, path, tolerances=TOLERANCES, name_column="NAME"):
+        import geopandas as gpd
+
+        gdf = gpd.read_file(shapefile)
+        geometries = gdf.geometry.values
+        columns = {
+            "name": pa.array(gdf[name_column].astype(str).tolist()),
+            "vertices": pa.array(shapely.get_num_coordinates(geometries).tolist()),
+            _column(0): pa.array(shapely.to_wkb(geometries).tolist(), type=pa.binary()),
+        }
+        for tolerance in tolerances:
+            simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+            columns[_column(tolerance)] = pa.array(shapely.to_wkb(simplified).tolist(), type=pa.binary())
+
+        table = pa.table(columns).replace_schema_metadata({"tolerances": ",".join(f"{t:g}" for t in tolerances)})
+        with atomic_path(path) as tmp:
+            pq.write_table(table, tmp, row_group_size=1)
+        return cls(path)
+
+    @classmethod
+    def open(cls, shapefile, path=None, tolerances=TOLERANCES):
+        """Open the catalog for a shapefile, building it first if it is missing or stale."""
+        path = path or os.path.splitext(shapefile)[0] + ".boundaries.parquet"
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(shapefile):
+            return cls.build(shapefile, path, tolerances)
+        return cls(path)
+
+    @property
+    def tolerances(self):
+        stored = self.file.schema_arrow.metadata.get(b"tolerances", b"").decode()
+        return (0.0,) + tuple(float(t) for t in stored.split(",") if t)
+
+    def names(self):
+        if self._names is None:
+            self._names = self.file.read(columns=["name"]).column("name").to_pylist()
+            self._index = {name: i for i, name in enumerate(self._names)}
+        return self._names
+
+    def vertices(self):
+        return self.file.read(columns=["vertices"]).column("vertices").to_pylist()
+
+    def wkb(self, name, tolerance=0.0):
+        self.names()
+        column = _column(tolerance)
+        return self.file.read_row_group(self._index[name], columns=[column]).column(column)[0].as_py()
+
+    def geometry(self, name, tolerance=0.0):
+        return shapely.from_wkb(self.wkb(name, tolerance))
@@ -1,100 +1,281 @@
-import random
-from shapely.geometry import Point
-from shapely.ops import nearest_points
-import matplotlib.pyplot as plt
 import numpy as np
-import streamlit as st
-from .family import Family
-from .stochastic_vector_field import StochasticVectorField2D
+from .boundary import CityBoundary
+from .exclusion import POLICIES, Exclusion
+from .family import FamilyMap
+from .metrics import SegregationMetrics
+from .parallel import ParallelStepper
+from .population import GROUPS, Population
+from .profiling import StepProfiler
+from .stochastic_vector_field import ForceRules, StochasticVectorField2D, truncation_error
+from .trajectory import TrajectoryStore, save_checkpoint
+
+UPDATES = ("sequential", "synchronous")
+# Family id prefixes; other groups use "<group>_".
+PREFIXES = {"white": "w", "black": "b"}
+
 
 class City:
-    def __init__(self, wp, bp, city_boundary, min_distance=1.0, max_step_size=0.1):
+    def __init__(self, wp, bp, city_boundary, min_distance=1.0, max_step_size=0.1, dtype=np.float64,
+                 cutoff=None, cutoff_sample=None, theta=None, workers=None, seed=None, rules=None,
+                 exclusion=None, update="sequential", populations=None, boundary_resolution=None):
         self.wp = wp
         self.bp = bp
-        self.families = {}
+        self.rules = rules or ForceRules()
+        # Families per group; populations ({group: families}) replaces wp and
+        # bp for groups other than white and black, named by rules.groups.
+        self.populations = dict(populations) if populations is not None else dict(zip(GROUPS, (wp, bp)))
+        unknown = set(self.populations) - set(self.rules.groups)
+        if unknown:
+            raise ValueError(f"no force rules for groups {sorted(unknown)}, rules cover {self.rules.groups}")
+        self.population = Population(self.rules.groups, dtype=dtype)
+        self.families = FamilyMap(self.population)
+        # Cells along the longer side of a raster BoundaryField for
+        # containment and projection; None uses the exact polygon everywhere.
+        self.boundary_resolution = boundary_resolution
         self.city_boundary = city_boundary
         self.min_distance = min_distance
         self.max_step_size = max_step_size
+        # How moves closer than min_distance to another family are handled:
+        # "reject", "shorten", or None to allow them.
+        if exclusion is not None and exclusion not in POLICIES:
+            raise ValueError(f"unknown exclusion policy {exclusion!r}, expected one of {POLICIES}")
+        self.exclusion = exclusion
+        # "sequential" moves families one at a time, each seeing the moves
+        # made before it in the step; "synchronous" computes every move from
+        # the positions at the start of the step and applies them together.
+        if update not in UPDATES:
+            raise ValueError(f"unknown update order {update!r}, expected one of {UPDATES}")
+        self.update = update
+        # Families farther apart than cutoff ignore each other; None keeps the
+        # exact all-pairs forces.
+        self.cutoff = cutoff
+        # Families sampled after every cutoff step to fill self.truncation;
+        # the comparison costs two exact force passes over the sample, so it
+        # is off by default and truncation_error() gives it on demand.
+        self.cutoff_sample = cutoff_sample
+        self.truncation = None
+        # Barnes-Hut opening angle; None keeps the exact all-pairs forces.
+        self.theta = theta
+        if cutoff is not None and theta is not None:
+            raise ValueError("cutoff and theta are alternative force modes, set only one")
+        # With workers > 1 the forces are computed on a process pool from the
+        # positions at the start of each step.
+        self.workers = workers
+        # Every random draw of the run (placement and noise) comes from this
+        # generator, so a seed reproduces the whole trajectory.
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.stepper = None
+        self.step_count = 0
+        self.renderer = None
+        self.metrics = None
+        self.trajectory = None
+        # Per-phase timings, enabled by profile(); None skips all timing.
+        self.profiler = None
 
-    def populate(self):
-        centroid = self.city_boundary.centroid
-        center_x, center_y = centroid.x, centroid.y
+    @property
+    def city_boundary(self):
+        return self.boundary.geometry
 
-        for i in range(self.wp):
-            id = f"w{i}"
-            x, y = self.random_position_near_center(center_x, center_y)
-            family = Family("white", x, y)
-            self.families[id] = family
+    @city_boundary.setter
+    def city_boundary(self, geometry):
+        # A prebuilt CityBoundary is used as it is, so its BoundaryField is
+        # only built once.
+        if isinstance(geometry, CityBoundary):
+            if self.boundary_resolution is None:
+                self.boundary_resolution = geometry.resolution
+            elif geometry.resolution != self.boundary_resolution:
+                raise ValueError(f"boundary has resolution {geometry.resolution}, "
+                                 f"expected {self.boundary_resolution}")
+            self.boundary = geometry
+        else:
+            self.boundary = CityBoundary(geometry, self.boundary_resolution)
 
-        for i in range(self.bp):
-            id = f"b{i}"
-            x, y = self.random_position_near_center(center_x, center_y)
-            family = Family("black", x, y)
-            self.families[id] = family
+    def populate(self, distribution="box", spread=0.05):
+        # distribution is "box" (uniform within +-spread of the centroid),
+        # "gaussian" (sigma = spread around the centroid) or "polygon"
+        # (uniform over the whole city).  Populating again replaces the
+        # families and starts over from step 0.
+        self.population = Population(self.rules.groups, dtype=self.population.dtype)
+        self.families.population = self.population
+        self.step_count = 0
+        for race, count in self.populations.items():
+            xs, ys = self.boundary.sample(count, distribution, spread, self.rng)
+            self.population.extend(race, xs, ys, PREFIXES.get(race, f"{race}_"))
 
     def random_position_near_center(self, center_x, center_y):
         while True:
-            x_offset = random.uniform(-0.05, 0.05)
-            y_offset = random.uniform(-0.05, 0.05)
+            x_offset, y_offset = self.rng.uniform(-0.05, 0.05, 2)
             x = center_x + x_offset
             y = center_y + y_offset
-            point = Point(x, y)
-            if self.city_boundary.contains(point):
+            if self.boundary.contains(x, y):
                 return x, y
 
     def step(self):
-        for family in self.families.values():
-            vf = StochasticVectorField2D(self, family)
-            vector = vf.compute_vector()
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin(self)
+        if self.workers is not None and self.workers > 1:
+            noise = self.rng.standard_normal((len(self.population), 2))
+            vectors = self.parallel_stepper().vectors(self.population, noise)
+            if profiler is not None:
+                profiler.lap("forces")
+            self.move_all(vectors)
+        elif self.theta is not None or self.update == "synchronous":
+            # The Barnes-Hut tree is built once per step, so it always moves
+            # every family by the forces of the positions at the start of the step.
+            vectors = StochasticVectorField2D(self).compute_vectors()
+            if profiler is not None:
+                profiler.lap("forces")
+            self.move_all(vectors)
+        else:
+            self.step_sequential()
+        self.step_count += 1
+        if self.metrics is not None:
+            self.metrics.record(self)
+            if profiler is not None:
+                profiler.lap("metrics")
+        if self.trajectory is not None:
+            self.trajectory.append(self.population)
+            if profiler is not None:
+                profiler.lap("trajectory")
+
+        if self.cutoff is not None and self.cutoff_sample:
+            self.truncation = self.truncation_error(self.cutoff_sample)
+            if profiler is not None:
+                profiler.lap("truncation")
+        if profiler is not None:
+            profiler.finish(self)
 
-            new_x = family.x + vector[0]
-            new_y = family.y + vector[1]
+    def step_sequential(self):
+        vf = StochasticVectorField2D(self)
+        x, y, codes = vf.arrays()
+        profiler = self.profiler
+        exclusion = self.exclusion_rules()
+        if exclusion is not None:
+            exclusion.track(x, y)
+        for i in range(len(x)):
+            vector = vf.vector_at(i)
+            if profiler is not None:
+                profiler.lap("forces")
 
-            distance = np.linalg.norm([new_x - family.x, new_y - family.y])
+            new_x = x[i] + vector[0]
+            new_y = y[i] + vector[1]
+
+            distance = np.linalg.norm(vector)
             if distance > self.max_step_size:
                 scale_factor = self.max_step_size / distance
-                new_x = family.x + vector[0] * scale_factor
-                new_y = family.y + vector[1] * scale_factor
+                new_x = x[i] + vector[0] * scale_factor
+                new_y = y[i] + vector[1] * scale_factor
+                if profiler is not None:
+                    profiler.count("clamped")
+            if profiler is not None:
+                profiler.lap("clamp")
+
+            new_x, new_y = self.boundary.keep_within(new_x, new_y, profiler)
+            if profiler is not None:
+                profiler.lap("boundary")
+            if exclusion is not None:
+                new_x, new_y = exclusion.resolve(i, x, y, new_x, new_y)
+                if profiler is not None:
+                    profiler.lap("exclusion")
+
+            x[i] = new_x
+            y[i] = new_y
+            vf.moved(i)
+        self.count_exclusions(exclusion)
+
+    def exclusion_rules(self):
+        """The Exclusion enforcing min_distance, or None when it is not enforced."""
+        if self.exclusion is None or not self.min_distance:
+            return None
+        return Exclusion(self.min_distance, self.exclusion, self.boundary)
+
+    def count_exclusions(self, exclusion):
+        if exclusion is not None and self.profiler is not None:
+            self.profiler.count("rejected", exclusion.rejected)
+            self.profiler.count("shortened", exclusion.shortened)
 
-            if not self.city_boundary.contains(Point(new_x, new_y)):
-                new_x, new_y = self.keep_within_bounds(new_x, new_y)
+    def parallel_stepper(self):
+        if self.stepper is None or self.stepper.size != len(self.population):
+            self.close()
+            self.stepper = ParallelStepper(self, self.workers)
+        return self.stepper
 
-            family.x = new_x
-            family.y = new_y
+    def close(self):
+        if self.stepper is not None:
+            self.stepper.close()
+            self.stepper = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def track_metrics(self, cell_size=0.01, radial_bins=20):
+        """Record segregation metrics now and after every step in self.metrics."""
+        self.metrics = SegregationMetrics(self, cell_size, radial_bins)
+        self.metrics.record(self)
+        return self.metrics
+
+    def record_trajectory(self, directory, chunk_steps=64):
+        """Append the current positions and those after every step to a TrajectoryStore."""
+        self.trajectory = TrajectoryStore.create(directory, len(self.population), self.population.groups,
+                                                 self.population.dtype, chunk_steps)
+        self.trajectory.append(self.population)
+        return self.trajectory
+
+    def profile(self, hook=None):
+        """Time every phase of each following step; hook(row) is called after each one."""
+        if self.profiler is None:
+            self.profiler = StepProfiler()
+        if hook is not None:
+            self.profiler.add_hook(hook)
+        return self.profiler
+
+    def save_checkpoint(self, path):
+        save_checkpoint(self, path)
+
+    def truncation_error(self, sample=64):
+        """Cutoff against exact forces on sample evenly spaced families, at the current positions."""
+        x, y, codes = self.population.x, self.population.y, self.population.codes
+        targets = np.unique(np.linspace(0, len(x) - 1, min(sample, len(x))).astype(int))
+        return truncation_error(x, y, codes, self.cutoff, targets, self.rules.interaction)
+
+    def move_all(self, vectors):
+        x, y = self.population.x, self.population.y
+        distance = np.hypot(vectors[:, 0], vectors[:, 1])
+        scale = np.minimum(1.0, self.max_step_size / np.maximum(distance, 1e-300))
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.count("clamped", int(np.count_nonzero(distance > self.max_step_size)))
+            profiler.lap("clamp")
+        new_x, new_y = self.keep_within_bounds(x + vectors[:, 0] * scale, y + vectors[:, 1] * scale)
+        if profiler is not None:
+            profiler.lap("boundary")
+        exclusion = self.exclusion_rules()
+        if exclusion is not None:
+            new_x, new_y = exclusion.resolve_all(x, y, new_x, new_y)
+            self.count_exclusions(exclusion)
+        x[:] = new_x
+        y[:] = new_y
+        if profiler is not None:
+            profiler.lap("exclusion")
 
     def keep_within_bounds(self, new_x, new_y):
-        point = Point(new_x, new_y)
-        if self.city_boundary.contains(point):
-            return new_x, new_y
-        else:
-            nearest_point = nearest_points(point, self.city_boundary.boundary)[1]
-            return nearest_point.x, nearest_point.y
+        return self.boundary.keep_within(new_x, new_y, self.profiler)
 
     def plot_grid(self, step_num, city_name):
-        plt.figure(figsize=(6, 6))
-        white_x = []
-        white_y = []
-        black_x = []
-        black_y = []
-
-        for family in self.families.values():
-            if family.race == "white":
-                white_x.append(family.x)
-                white_y.append(family.y)
-            else:
-                black_x.append(family.x)
-                black_y.append(family.y)
-
-        plt.scatter(white_x, white_y, color='orange', label="Majority Families", s=50)
-        plt.scatter(black_x, black_y, color='black', label="Minority Families", s=50)
-
-        x, y = self.city_boundary.exterior.xy
-        plt.plot(x, y, color='red', linewidth=2, label="City Boundary")
-
-        plt.xlim(self.city_boundary.bounds[0], self.city_boundary.bounds[2])
-        plt.ylim(self.city_boundary.bounds[1], self.city_boundary.bounds[3])
-        plt.xlabel('Longitude')
-        plt.ylabel('Latitude')
-        plt.title(f"Family Positions in {city_name} at Step {step_num}")
-        plt.legend()
-        st.pyplot(plt)
+        # Streamlit and matplotlib are only loaded for plotting, so headless
+        # runs import nothing beyond NumPy and Shapely.
+        import streamlit as st
+        from .render import Renderer
+
+        if self.renderer is None or self.renderer.city_name != city_name:
+            self.renderer = Renderer(self.city_boundary, city_name, self.population.groups)
+        if self.profiler is None:
+            st.pyplot(self.renderer.update(self.population, step_num))
+            return
+        with self.profiler.phase("render"):
+            st.pyplot(self.renderer.update(self.population, step_num))
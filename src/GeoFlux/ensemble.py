@@ -0,0 +1,133 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+import shapely
+from .boundary import CityBoundary
+from .city import City
+from .metrics import cell_counts, group_centroids, radial_edges, radial_profile, segregation_indices
+
+
+def _snapshot(city, edges, cell_size):
+    population = city.population
+    x, y, codes = population.x, population.y, population.codes
+    groups = len(population.groups)
+    counts = cell_counts(x, y, codes, groups, city.boundary.bounds, cell_size)
+    return (group_centroids(x, y, codes, groups),
+            radial_profile(x, y, codes, groups, city.boundary.center, edges),
+            *segregation_indices(counts))
+
+
+@lru_cache(maxsize=2)
+def _boundary(boundary_wkb, resolution):
+    # Replicates in one process share the boundary and its BoundaryField.
+    return CityBoundary(shapely.from_wkb(boundary_wkb), resolution)
+
+
+def run_replicate(boundary_wkb, wp, bp, steps, seed, city_kwargs=None, distribution="box",
+                  radial_bins=20, cell_size=0.01):
+    """Populate and step one City, returning its per-step metrics without plotting."""
+    city_kwargs = dict(city_kwargs or {})
+    boundary = _boundary(boundary_wkb, city_kwargs.pop("boundary_resolution", None))
+    with City(wp, bp, boundary, seed=seed, **city_kwargs) as city:
+        edges = radial_edges(city.boundary.bounds, city.boundary.center, radial_bins)
+        city.populate(distribution)
+        records = [_snapshot(city, edges, cell_size)]
+        for _ in range(steps):
+            city.step()
+            records.append(_snapshot(city, edges, cell_size))
+    centroids, radial, dissimilarity, exposure = zip(*records)
+    return np.array(centroids), np.array(radial), np.array(dissimilarity), np.array(exposure), edges
+
+
+class EnsembleResult:
+    """Per-step statistics across replicates.
+
+    ``centroids`` has shape (replicates, steps + 1, groups, 2), ``radial``
+    (replicates, steps + 1, groups, bins), and ``dissimilarity`` and
+    ``exposure`` (replicates, steps + 1, groups, groups) with one entry per
+    group pair, as from metrics.segregation_indices; index 0 along the step
+    axis is the populated city before its first step.
+    """
+
+    def __init__(self, centroids, radial, dissimilarity, exposure, radial_edges, elapsed):
+        self.centroids = centroids
+        self.radial = radial
+        self.dissimilarity = dissimilarity
+        self.exposure = exposure
+        self.radial_edges = radial_edges
+        self.elapsed = elapsed
+        self.replicates, steps = dissimilarity.shape[:2]
+        self.steps = steps - 1
+
+    @property
+    def centroid_mean(self):
+        return np.nanmean(self.centroids, axis=0)
+
+    @property
+    def centroid_var(self):
+        return np.nanvar(self.centroids, axis=0)
+
+    @property
+    def radial_mean(self):
+        return self.radial.mean(axis=0)
+
+    @property
+    def radial_var(self):
+        return self.radial.var(axis=0)
+
+    @property
+    def dissimilarity_mean(self):
+        return np.nanmean(self.dissimilarity, axis=0)
+
+    @property
+    def dissimilarity_var(self):
+        return np.nanvar(self.dissimilarity, axis=0)
+
+    @property
+    def exposure_mean(self):
+        return np.nanmean(self.exposure, axis=0)
+
+    @property
+    def exposure_var(self):
+        return np.nanvar(self.exposure, axis=0)
+
+    @property
+    def isolation(self):
+        """Isolation index of each group, as (replicates, steps + 1, groups)."""
+        return np.diagonal(self.exposure, axis1=2, axis2=3)
+
+    @property
+    def isolation_mean(self):
+        return np.nanmean(self.isolation, axis=0)
+
+    @property
+    def isolation_var(self):
+        return np.nanvar(self.isolation, axis=0)
+
+    @property
+    def throughput(self):
+        """Replicate-steps per second."""
+        return self.replicates * self.steps / self.elapsed if self.elapsed > 0 else float("inf")
+
+
+def run_ensemble(city_boundary, wp, bp, steps, replicates, seed=None, workers=None, city_kwargs=None,
+                 distribution="box", radial_bins=20, cell_size=0.01):
+    """Run independent seeded replicates of a City across worker processes."""
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(replicates)]
+    args = [(shapely.to_wkb(city_boundary), wp, bp, steps, s, city_kwargs, distribution, radial_bins, cell_size)
+            for s in seeds]
+
+    start = time.perf_counter()
+    workers = min(workers or os.cpu_count(), replicates)
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(run_replicate, *zip(*args)))
+    else:
+        results = [run_replicate(*a) for a in args]
+    elapsed = time.perf_counter() - start
+
+    centroids, radial, dissimilarity, exposure, edges = zip(*results)
+    return EnsembleResult(np.array(centroids), np.array(radial), np.array(dissimilarity), np.array(exposure),
+                          edges[0], elapsed)
@@ -0,0 +1,115 @@
+import numpy as np
+from .spatial import SpatialGrid, close_pairs
+
+POLICIES = ("reject", "shorten")
+# Batched "shorten" halves a conflicting move this many times before dropping it.
+HALVINGS = 6
+
+
+def allowed_fraction(px, py, dx, dy, qx, qy, radius):
+    """Largest t in [0, 1] such that the move from p to p + t * d enters no disk of radius around any q.
+
+    Disks that p already lies in only block moves that head deeper into them.
+    """
+    fx, fy = px - qx, py - qy
+    a = dx * dx + dy * dy
+    if a == 0 or len(fx) == 0:
+        return 1.0
+    b = fx * dx + fy * dy
+    c = fx * fx + fy * fy - radius * radius
+    inside = c < 0
+    if np.any(inside & (b < 0)):
+        return 0.0
+    disc = b * b - a * c
+    entering = ~inside & (disc > 0) & (b < 0)
+    if not entering.any():
+        return 1.0
+    t = (-b[entering] - np.sqrt(disc[entering])) / a
+    return float(min(1.0, t.min()))
+
+
+class Exclusion:
+    """Minimum distance between families, enforced as they move.
+
+    With policy "reject" a move that ends too close to another family is
+    dropped; with "shorten" the family stops short of the conflict.  Pairs
+    that were already too close may stay where they are.
+    """
+
+    def __init__(self, min_distance, policy="reject", boundary=None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown exclusion policy {policy!r}, expected one of {POLICIES}")
+        self.min_distance = float(min_distance)
+        self.policy = policy
+        self.boundary = boundary
+        self.grid = None
+        self.rejected = 0
+        self.shortened = 0
+
+    def track(self, x, y):
+        """Hash the current positions into cells of min_distance for resolve()."""
+        self.grid = SpatialGrid(x, y, self.min_distance)
+        return self
+
+    def resolve(self, i, x, y, new_x, new_y):
+        """Where family i may move instead of (new_x, new_y), checking only the cells around the move.
+
+        "shorten" stops the family where its path first comes within
+        min_distance of another one.  The grid is updated, x and y are not.
+        """
+        r = self.min_distance
+        old_x, old_y = x[i], y[i]
+        if self.policy == "reject":
+            near = self.grid.near(new_x, new_y, r)
+            near = near[near != i]
+            if np.any((x[near] - new_x) ** 2 + (y[near] - new_y) ** 2 < r * r):
+                self.rejected += 1
+                return old_x, old_y
+        else:
+            dx, dy = new_x - old_x, new_y - old_y
+            near = self.grid.near(old_x + dx / 2, old_y + dy / 2, r + max(abs(dx), abs(dy)) / 2)
+            near = near[near != i]
+            t = allowed_fraction(old_x, old_y, dx, dy, x[near], y[near], r)
+            if t < 1:
+                new_x, new_y = old_x + t * dx, old_y + t * dy
+                # The shortened path of a concave city can end outside it.
+                if t == 0 or self.boundary is not None and not self.boundary.contains(new_x, new_y):
+                    self.rejected += 1
+                    return old_x, old_y
+                self.shortened += 1
+        self.grid.move(i, new_x, new_y)
+        return new_x, new_y
+
+    def resolve_all(self, x, y, new_x, new_y):
+        """Positions for a simultaneous move of every family from (x, y) towards (new_x, new_y).
+
+        Conflicts are resolved in rounds: in each pair that ends too close
+        the higher index gives way ("reject" drops its move, "shorten"
+        halves it, dropping it after HALVINGS halvings).
+        """
+        r = self.min_distance
+        dx, dy = new_x - x, new_y - y
+        t = np.where((dx != 0) | (dy != 0), 1.0, 0.0)
+        while True:
+            px, py = x + t * dx, y + t * dy
+            i, j = close_pairs(px, py, r)
+            moving = (t[i] > 0) | (t[j] > 0)
+            i, j = i[moving], j[moving]
+            if len(i) == 0:
+                break
+            # Give way with j unless only i moved.
+            losers = np.unique(np.where(t[j] > 0, j, i))
+            if self.policy == "reject":
+                t[losers] = 0.0
+            else:
+                t[losers] *= 0.5
+                t[losers[t[losers] < 0.5 ** HALVINGS]] = 0.0
+                shortened = losers[t[losers] > 0]
+                if self.boundary is not None and len(shortened):
+                    outside = ~self.boundary.contains(x[shortened] + t[shortened] * dx[shortened],
+                                                      y[shortened] + t[shortened] * dy[shortened])
+                    t[shortened[outside]] = 0.0
+        moved = (dx != 0) | (dy != 0)
+        self.rejected += int(np.count_nonzero(moved & (t == 0)))
+        self.shortened += int(np.count_nonzero((t > 0) & (t < 1)))
+        return x + t * dx, y + t * dy
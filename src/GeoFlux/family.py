@@ -1,5 +1,122 @@
+from collections.abc import ItemsView, Mapping, ValuesView
+
+
 class Family:
+    """A view of one family stored in a Population.
+
+    A family created on its own holds its race and position in slots until
+    it is added to a FamilyMap, which copies them into the Population and
+    turns the family into a view of its row.
+    """
+
+    __slots__ = ("_population", "_index", "_race", "_x", "_y")
+
     def __init__(self, race, x, y):
-        self.race = race
-        self.x = x
-        self.y = y
\ No newline at end of file
+        self._population = None
+        self._index = None
+        self._race = race
+        self._x = float(x)
+        self._y = float(y)
+
+    @classmethod
+    def view(cls, population, index):
+        family = cls.__new__(cls)
+        family._population = population
+        family._index = index
+        return family
+
+    @property
+    def race(self):
+        if self._population is None:
+            return self._race
+        return self._population.groups[self._population.codes[self._index]]
+
+    @race.setter
+    def race(self, race):
+        if self._population is None:
+            self._race = race
+        else:
+            self._population.codes[self._index] = self._population.code_of(race)
+
+    @property
+    def x(self):
+        if self._population is None:
+            return self._x
+        return float(self._population.x[self._index])
+
+    @x.setter
+    def x(self, x):
+        if self._population is None:
+            self._x = float(x)
+        else:
+            self._population.x[self._index] = x
+
+    @property
+    def y(self):
+        if self._population is None:
+            return self._y
+        return float(self._population.y[self._index])
+
+    @y.setter
+    def y(self, y):
+        if self._population is None:
+            self._y = float(y)
+        else:
+            self._population.y[self._index] = y
+
+    def __eq__(self, other):
+        if not isinstance(other, Family):
+            return NotImplemented
+        if self._population is None:
+            return self is other
+        return self._population is other._population and self._index == other._index
+
+    def __hash__(self):
+        if self._population is None:
+            return object.__hash__(self)
+        return hash((id(self._population), self._index))
+
+    def __repr__(self):
+        return f"Family({self.race!r}, {self.x!r}, {self.y!r})"
+
+
+class _FamilyValues(ValuesView):
+    def __iter__(self):
+        population = self._mapping.population
+        return (Family.view(population, i) for i in range(len(population)))
+
+
+class _FamilyItems(ItemsView):
+    def __iter__(self):
+        population = self._mapping.population
+        return ((id, Family.view(population, i)) for i, id in enumerate(population.ids()))
+
+
+class FamilyMap(Mapping):
+    """Dict-like access to a Population by family id, e.g. ``families["w0"]``."""
+
+    def __init__(self, population):
+        self.population = population
+
+    def __getitem__(self, id):
+        return Family.view(self.population, self.population.index_of(id))
+
+    def __setitem__(self, id, family):
+        index = self.population.add(family.race, family.x, family.y, id)
+        family._population = self.population
+        family._index = index
+
+    def __contains__(self, id):
+        return self.population.find(id) is not None
+
+    def __iter__(self):
+        return self.population.ids()
+
+    def __len__(self):
+        return len(self.population)
+
+    def values(self):
+        return _FamilyValues(self)
+
+    def items(self):
+        return _FamilyItems(self)
@@ -0,0 +1,143 @@
+import numpy as np
+
+
+def group_centroids(x, y, codes, groups):
+    """Mean position of each group as a (groups, 2) array, NaN for empty groups."""
+    counts = np.bincount(codes, minlength=groups)[:groups]
+    sx = np.bincount(codes, weights=x, minlength=groups)[:groups]
+    sy = np.bincount(codes, weights=y, minlength=groups)[:groups]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.column_stack((sx / counts, sy / counts))
+
+
+def radial_edges(bounds, center, bins=20):
+    """Equal-width radius bins out to the farthest corner of the bounds."""
+    corners = np.array([(bounds[0], bounds[1]), (bounds[0], bounds[3]), (bounds[2], bounds[1]), (bounds[2], bounds[3])])
+    radius = np.hypot(corners[:, 0] - center[0], corners[:, 1] - center[1]).max()
+    return np.linspace(0, radius, bins + 1)
+
+
+def radial_profile(x, y, codes, groups, center, edges):
+    """Families per unit area of each annulus around the center, as (groups, bins)."""
+    radius = np.hypot(x - center[0], y - center[1])
+    bins = len(edges) - 1
+    ring = np.clip(np.searchsorted(edges, radius, side="right") - 1, 0, bins - 1)
+    counts = np.bincount(codes.astype(np.int64) * bins + ring, minlength=groups * bins)[:groups * bins]
+    area = np.pi * (edges[1:] ** 2 - edges[:-1] ** 2)
+    return counts.reshape(groups, bins) / area
+
+
+def cell_counts(x, y, codes, groups, bounds, cell_size):
+    """Families of each group per grid cell over the bounds, as (groups, cells)."""
+    nx = max(1, int(np.ceil((bounds[2] - bounds[0]) / cell_size)))
+    ny = max(1, int(np.ceil((bounds[3] - bounds[1]) / cell_size)))
+    ix = np.clip(((x - bounds[0]) / cell_size).astype(np.int64), 0, nx - 1)
+    iy = np.clip(((y - bounds[1]) / cell_size).astype(np.int64), 0, ny - 1)
+    cell = codes.astype(np.int64) * (nx * ny) + ix * ny + iy
+    return np.bincount(cell, minlength=groups * nx * ny)[:groups * nx * ny].reshape(groups, nx * ny)
+
+
+def dissimilarity_index(counts, a=0, b=1):
+    """Share of group a or b that would have to move cells to match the other's spread."""
+    ta, tb = counts[a].sum(), counts[b].sum()
+    if ta == 0 or tb == 0:
+        return np.nan
+    return 0.5 * np.abs(counts[a] / ta - counts[b] / tb).sum()
+
+
+def segregation_indices(counts):
+    """Dissimilarity and exposure of every group pair from (groups, cells) counts, as two (groups, groups) arrays.
+
+    exposure[a, b] is the chance that a random neighbor (same cell) of an
+    a-family belongs to b; the diagonal is the isolation index of each
+    group.  Pairs involving an empty group are NaN.
+    """
+    groups = len(counts)
+    totals = counts.sum(axis=0)
+    occupied = totals > 0
+    dissimilarity = np.zeros((groups, groups))
+    exposure = np.full((groups, groups), np.nan)
+    for a in range(groups):
+        group_total = counts[a].sum()
+        for b in range(groups):
+            if b > a:
+                dissimilarity[a, b] = dissimilarity[b, a] = dissimilarity_index(counts, a, b)
+            if group_total:
+                exposure[a, b] = (counts[a, occupied] / group_total * counts[b, occupied] / totals[occupied]).sum()
+    return dissimilarity, exposure
+
+
+class SegregationMetrics:
+    """Per-step segregation time series for a City, kept up to date incrementally.
+
+    Families are binned onto a fixed grid over the city bounds; each record
+    only moves the families whose cell changed since the previous one.
+    """
+
+    def __init__(self, city, cell_size=0.01, radial_bins=20):
+        self.groups = tuple(city.population.groups)
+        self.bounds = city.boundary.bounds
+        self.center = city.boundary.center
+        self.cell_size = cell_size
+        self.nx = max(1, int(np.ceil((self.bounds[2] - self.bounds[0]) / cell_size)))
+        self.ny = max(1, int(np.ceil((self.bounds[3] - self.bounds[1]) / cell_size)))
+        self.edges = radial_edges(self.bounds, self.center, radial_bins)
+        self.cells = None
+        self.counts = None
+        self.records = []
+        self.radial = []
+
+    def _cells(self, x, y):
+        ix = np.clip(((x - self.bounds[0]) / self.cell_size).astype(np.int64), 0, self.nx - 1)
+        iy = np.clip(((y - self.bounds[1]) / self.cell_size).astype(np.int64), 0, self.ny - 1)
+        return ix * self.ny + iy
+
+    def update(self, population):
+        cells = self._cells(population.x, population.y)
+        codes = population.codes.astype(np.int64)
+        if self.cells is None or len(cells) != len(self.cells):
+            self.counts = np.zeros((len(self.groups), self.nx * self.ny), dtype=np.int64)
+            np.add.at(self.counts, (codes, cells), 1)
+        else:
+            moved = cells != self.cells
+            np.subtract.at(self.counts, (codes[moved], self.cells[moved]), 1)
+            np.add.at(self.counts, (codes[moved], cells[moved]), 1)
+        self.cells = cells
+
+    def record(self, city):
+        population = city.population
+        self.update(population)
+        dissimilarity, exposure = segregation_indices(self.counts)
+        row = {"step": city.step_count}
+
+        for a, name in enumerate(self.groups):
+            for b, other in enumerate(self.groups):
+                if b > a:
+                    row[f"dissimilarity_{name}_{other}"] = float(dissimilarity[a, b])
+                key = f"isolation_{name}" if a == b else f"exposure_{name}_{other}"
+                row[key] = float(exposure[a, b])
+
+        centroids = group_centroids(population.x, population.y, population.codes, len(self.groups))
+        for a, name in enumerate(self.groups):
+            row[f"centroid_distance_{name}"] = float(np.hypot(centroids[a, 0] - self.center[0],
+                                                               centroids[a, 1] - self.center[1]))
+        self.records.append(row)
+        self.radial.append(radial_profile(population.x, population.y, population.codes, len(self.groups),
+                                          self.center, self.edges))
+        return row
+
+    def columns(self):
+        return list(self.records[0]) if self.records else []
+
+    def to_csv(self, path):
+        import csv
+
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns())
+            writer.writeheader()
+            writer.writerows(self.records)
+
+    def to_npz(self, path):
+        """All scalar series plus the (steps, groups, bins) radial profiles and their bin edges."""
+        series = {column: np.array([row[column] for row in self.records]) for column in self.columns()}
+        np.savez(path, radial=np.array(self.radial), radial_edges=self.edges, **series)
@@ -0,0 +1,108 @@
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from .barnes_hut import BarnesHutTree
+from .stochastic_vector_field import center_forces, pair_forces
+
+# Set in each worker process by _attach.
+_shared = {}
+
+
+def _attach(names, size, dtype, groups, center, rules, cutoff, theta):
+    blocks = [SharedMemory(name=name) for name in names]
+    _shared.update(
+        blocks=blocks,
+        x=np.ndarray(size, dtype=dtype, buffer=blocks[0].buf),
+        y=np.ndarray(size, dtype=dtype, buffer=blocks[1].buf),
+        codes=np.ndarray(size, dtype=np.int8, buffer=blocks[2].buf),
+        noise=np.ndarray((size, 2), dtype=float, buffer=blocks[3].buf),
+        out=np.ndarray((size, 2), dtype=float, buffer=blocks[4].buf),
+        groups=groups, center=center, rules=rules, cutoff=cutoff, theta=theta, tree=(None, None),
+    )
+
+
+def _chunk_vectors(start, stop, step):
+    s = _shared
+    rules = s["rules"]
+    x, y, codes = s["x"], s["y"], s["codes"]
+    tx, ty, tcodes = x[start:stop], y[start:stop], codes[start:stop]
+
+    if s["theta"] is not None:
+        built_for, tree = s["tree"]
+        if built_for != step:
+            tree = BarnesHutTree(x, y, codes, s["groups"])
+            s["tree"] = (step, tree)
+        force, counts = tree.forces(tx, ty, tcodes, rules.interaction, s["theta"])
+    else:
+        force, counts = pair_forces(tx, ty, tcodes, x, y, codes, rules.interaction, s["cutoff"])
+
+    # The parent draws the step's standard normal noise in one call, so the
+    # result does not depend on how the families are split across workers.
+    force += np.reshape(rules.sigma(tcodes), (-1, 1)) * s["noise"][start:stop] * np.sqrt(counts)[:, None]
+    force += center_forces(tx, ty, *s["center"], rules.pull(tcodes))
+    s["out"][start:stop] = force
+
+
+def _release(pool, blocks):
+    pool.shutdown()
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+class ParallelStepper:
+    """Computes every family's displacement vector on a process pool.
+
+    Positions are copied once per step into shared memory that the workers
+    map, so nothing but chunk bounds is pickled per step.  close() releases
+    the pool and the shared memory; a stepper that is never closed releases
+    them when it is garbage collected or at exit.
+    """
+
+    def __init__(self, city, workers=None, chunk_size=2048):
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.step = 0
+        population = city.population
+        self.size = len(population)
+        self.dtype = population.dtype
+
+        self.blocks = [
+            SharedMemory(create=True, size=max(1, self.size * population.dtype.itemsize)),
+            SharedMemory(create=True, size=max(1, self.size * population.dtype.itemsize)),
+            SharedMemory(create=True, size=max(1, self.size)),
+            SharedMemory(create=True, size=max(1, self.size * 2 * 8)),
+            SharedMemory(create=True, size=max(1, self.size * 2 * 8)),
+        ]
+        self.x = np.ndarray(self.size, dtype=self.dtype, buffer=self.blocks[0].buf)
+        self.y = np.ndarray(self.size, dtype=self.dtype, buffer=self.blocks[1].buf)
+        self.codes = np.ndarray(self.size, dtype=np.int8, buffer=self.blocks[2].buf)
+        self.noise = np.ndarray((self.size, 2), dtype=float, buffer=self.blocks[3].buf)
+        self.out = np.ndarray((self.size, 2), dtype=float, buffer=self.blocks[4].buf)
+
+        self.pool = ProcessPoolExecutor(
+            self.workers,
+            initializer=_attach,
+            initargs=([block.name for block in self.blocks], self.size, self.dtype,
+                      len(population.groups), city.boundary.center, city.rules, city.cutoff, city.theta),
+        )
+        self._finalizer = weakref.finalize(self, _release, self.pool, self.blocks)
+
+    def vectors(self, population, noise):
+        """Displacement vectors for every family, given (families, 2) standard normal noise."""
+        self.x[:] = population.x
+        self.y[:] = population.y
+        self.codes[:] = population.codes
+        self.noise[:] = noise
+        self.step += 1
+        futures = [self.pool.submit(_chunk_vectors, start, min(start + self.chunk_size, self.size), self.step)
+                   for start in range(0, self.size, self.chunk_size)]
+        for future in futures:
+            future.result()
+        return self.out.copy()
+
+    def close(self):
+        self._finalizer()
+        self.blocks = []
@@ -0,0 +1,176 @@
+import re
+from bisect import bisect_right
+import numpy as np
+
+GROUPS = ("white", "black")
+
+_NUMBERED_ID = re.compile(r"(.*?)(0|[1-9][0-9]*)$")
+
+
+class Population:
+    """Struct-of-arrays store of family positions and group codes.
+
+    Ids are kept as runs of ``prefix + number`` (e.g. ``w0`` .. ``w399``), so the
+    id index costs memory per run rather than per family.
+    """
+
+    def __init__(self, groups=GROUPS, dtype=np.float64, capacity=0):
+        self.groups = tuple(groups)
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self._x = np.empty(capacity, dtype=self.dtype)
+        self._y = np.empty(capacity, dtype=self.dtype)
+        self._codes = np.empty(capacity, dtype=np.int8)
+        # Each run is [start, stop, prefix, first]; first is None for ids
+        # that do not end in a number.
+        self._runs = []
+        self._run_starts = []
+        self._by_prefix = {}
+        self._literals = {}
+
+    @property
+    def x(self):
+        return self._x[:self.size]
+
+    @property
+    def y(self):
+        return self._y[:self.size]
+
+    @property
+    def codes(self):
+        return self._codes[:self.size]
+
+    @property
+    def nbytes(self):
+        return self._x.nbytes + self._y.nbytes + self._codes.nbytes
+
+    def __len__(self):
+        return self.size
+
+    def code_of(self, group):
+        return self.groups.index(group)
+
+    def _reserve(self, n):
+        needed = self.size + n
+        if needed <= len(self._x):
+            return
+        capacity = max(needed, 2 * len(self._x), 16)
+        for name in ("_x", "_y", "_codes"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _next_number(self, prefix):
+        runs = self._by_prefix.get(prefix, [])
+        return max((run[3] + run[1] - run[0] for run in runs), default=0)
+
+    def _add_run(self, start, stop, prefix, first):
+        run = [start, stop, prefix, first]
+        self._runs.append(run)
+        self._run_starts.append(start)
+        if first is None:
+            self._literals[prefix] = start
+        else:
+            self._by_prefix.setdefault(prefix, []).append(run)
+
+    def extend(self, group, xs, ys, prefix=""):
+        """Append families of one group with ids ``prefix0``, ``prefix1``, ..."""
+        xs = np.asarray(xs, dtype=self.dtype)
+        ys = np.asarray(ys, dtype=self.dtype)
+        n = len(xs)
+        self._reserve(n)
+        start, stop = self.size, self.size + n
+        self._x[start:stop] = xs
+        self._y[start:stop] = ys
+        self._codes[start:stop] = self.code_of(group)
+        if n:
+            self._add_run(start, stop, prefix, self._next_number(prefix))
+        self.size = stop
+        return slice(start, stop)
+
+    def add(self, group, x, y, id=None):
+        """Add one family, or overwrite the family already stored under ``id``."""
+        if id is None:
+            id = str(self._next_number(""))
+        index = self.find(id)
+        if index is None:
+            self._reserve(1)
+            index = self.size
+            self.size += 1
+            self._index_id(index, id)
+        self._x[index] = x
+        self._y[index] = y
+        self._codes[index] = self.code_of(group)
+        return index
+
+    def _index_id(self, index, id):
+        match = _NUMBERED_ID.match(id)
+        if match is None:
+            self._add_run(index, index + 1, id, None)
+            return
+        prefix, number = match.group(1), int(match.group(2))
+        last = self._runs[-1] if self._runs else None
+        if (last is not None and last[2] == prefix and last[3] is not None
+                and last[1] == index and last[3] + last[1] - last[0] == number):
+            last[1] += 1
+        else:
+            self._add_run(index, index + 1, prefix, number)
+
+    def find(self, id):
+        if not isinstance(id, str):
+            return None
+        if id in self._literals:
+            return self._literals[id]
+        match = _NUMBERED_ID.match(id)
+        if match is None:
+            return None
+        prefix, number = match.group(1), int(match.group(2))
+        for start, stop, _, first in self._by_prefix.get(prefix, ()):
+            if first <= number < first + stop - start:
+                return start + number - first
+        return None
+
+    def index_of(self, id):
+        index = self.find(id)
+        if index is None:
+            raise KeyError(id)
+        return index
+
+    def id_of(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        start, _, prefix, first = self._runs[bisect_right(self._run_starts, index) - 1]
+        if first is None:
+            return prefix
+        return f"{prefix}{first + index - start}"
+
+    def ids(self):
+        for start, stop, prefix, first in self._runs:
+            if first is None:
+                yield prefix
+            else:
+                for i in range(stop - start):
+                    yield f"{prefix}{first + i}"
+
+    def state(self):
+        """Plain-data copy of the population, e.g. for checkpoints."""
+        return {
+            "groups": self.groups,
+            "dtype": self.dtype.str,
+            "x": self.x.copy(),
+            "y": self.y.copy(),
+            "codes": self.codes.copy(),
+            "runs": [tuple(run) for run in self._runs],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        population = cls(state["groups"], state["dtype"], capacity=len(state["x"]))
+        population.size = len(state["x"])
+        population._x[:] = state["x"]
+        population._y[:] = state["y"]
+        population._codes[:] = state["codes"]
+        for run in state["runs"]:
+            population._add_run(*run)
+        return population
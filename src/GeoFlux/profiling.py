@@ -0,0 +1,76 @@
+import time
+from contextlib import contextmanager
+
+PHASES = ("forces", "clamp", "boundary", "exclusion", "metrics", "trajectory", "truncation", "render")
+COUNTERS = ("clamped", "escapes", "projections", "rejected", "shortened")
+
+
+class StepProfiler:
+    """Per-phase wall time and boundary counters for every City.step.
+
+    City marks the clock at the start of a phase and laps it into the phase
+    at the end, so a disabled profiler (city.profiler is None) costs one
+    comparison per phase.  After each step a flat row is appended to
+    records and passed to every hook.  Rendering between steps (plot_grid
+    or a phase("render") block) is charged to the next step's row.
+    """
+
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.records = []
+        self._reset()
+
+    def _reset(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self._mark = time.perf_counter()
+
+    def add_hook(self, hook):
+        """Call hook(row) after every step; returns the hook so it can be used as a decorator."""
+        self.hooks.append(hook)
+        return hook
+
+    def mark(self):
+        self._mark = time.perf_counter()
+
+    def lap(self, phase):
+        """Charge the time since the last mark or lap to phase."""
+        now = time.perf_counter()
+        self.times[phase] += now - self._mark
+        self._mark = now
+
+    def count(self, counter, n=1):
+        self.counts[counter] += n
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+
+    def begin(self, city):
+        self._step_start = time.perf_counter()
+        self.mark()
+
+    def finish(self, city):
+        seconds = time.perf_counter() - self._step_start
+        families = len(city.population)
+        row = {"step": city.step_count, "families": families, "seconds": seconds,
+               "families_per_second": families / seconds if seconds > 0 else float("inf")}
+        row.update(self.times)
+        row.update(self.counts)
+        self.records.append(row)
+        for hook in self.hooks:
+            hook(row)
+        self._reset()
+        return row
+
+    def columns(self):
+        return list(self.records[0]) if self.records else []
+
+    def totals(self):
+        """Phase times and counters summed over all recorded steps."""
+        keys = ("seconds",) + PHASES + COUNTERS
+        return {key: sum(row[key] for row in self.records) for key in keys}
@@ -0,0 +1,154 @@
+import io
+import numpy as np
+import shapely
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgb
+from matplotlib.figure import Figure
+
+LABELS = {"white": "Majority Families", "black": "Minority Families"}
+COLORS = ["orange", "black", "tab:blue", "tab:green", "tab:purple", "tab:brown", "tab:pink", "tab:cyan"]
+
+
+def boundary_rings(geometry):
+    """Exterior and interior rings of a Polygon or MultiPolygon as coordinate arrays."""
+    rings = []
+    for polygon in shapely.get_parts(geometry):
+        rings.append(shapely.get_coordinates(polygon.exterior))
+        rings.extend(shapely.get_coordinates(interior) for interior in polygon.interiors)
+    return rings
+
+
+class Renderer:
+    """A figure built once per city and updated in place for every frame.
+
+    The figure is not registered with pyplot, so it is freed with the
+    renderer instead of accumulating in pyplot's figure manager.
+    """
+
+    def __init__(self, city_boundary, city_name, groups=("white", "black"), figsize=(6, 6), point_size=50,
+                 mode="scatter", resolution=400):
+        # mode "density" bins families onto a resolution x resolution pixel
+        # grid and draws one image, so frame cost does not grow with N.
+        self.city_name = city_name
+        self.groups = tuple(groups)
+        self.mode = mode
+        self.figure = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+
+        self.scatters = [
+            self.ax.scatter([], [], color=COLORS[code % len(COLORS)], label=LABELS.get(group, f"{group} Families"),
+                            s=point_size)
+            for code, group in enumerate(self.groups)
+        ]
+        for i, ring in enumerate(boundary_rings(city_boundary)):
+            self.ax.plot(ring[:, 0], ring[:, 1], color='red', linewidth=2, label="City Boundary" if i == 0 else None)
+
+        bounds = city_boundary.bounds
+        self.bounds = bounds
+        self.image = None
+        if mode == "density":
+            self.resolution = resolution
+            self.colors = np.array([to_rgb(COLORS[code % len(COLORS)]) for code in range(len(self.groups))])
+            self.image = self.ax.imshow(np.ones((resolution, resolution, 3)), origin="lower", zorder=0,
+                                        extent=(bounds[0], bounds[2], bounds[1], bounds[3]), aspect="auto",
+                                        interpolation="nearest")
+        elif mode != "scatter":
+            raise ValueError(f"unknown render mode {mode!r}, expected 'scatter' or 'density'")
+        self.ax.set_xlim(bounds[0], bounds[2])
+        self.ax.set_ylim(bounds[1], bounds[3])
+        self.ax.set_xlabel('Longitude')
+        self.ax.set_ylabel('Latitude')
+        self.ax.legend()
+        self.title = self.ax.set_title("")
+
+    def update(self, population, step_num):
+        if self.image is not None:
+            self.image.set_data(self.density_image(population))
+        else:
+            positions = np.column_stack((population.x, population.y))
+            codes = population.codes
+            for code, scatter in enumerate(self.scatters):
+                scatter.set_offsets(positions[codes == code])
+        self.title.set_text(f"Family Positions in {self.city_name} at Step {step_num}")
+        return self.figure
+
+    def density_image(self, population):
+        """Per-group log-scaled pixel counts composited over white as an RGB array."""
+        n = self.resolution
+        x0, y0, x1, y1 = self.bounds
+        ix = ((population.x - x0) / (x1 - x0) * n).astype(np.int64)
+        iy = ((population.y - y0) / (y1 - y0) * n).astype(np.int64)
+        visible = (ix >= 0) & (ix < n) & (iy >= 0) & (iy < n)
+        groups = len(self.groups)
+        pixel = population.codes[visible].astype(np.int64) * n * n + iy[visible] * n + ix[visible]
+        counts = np.bincount(pixel, minlength=groups * n * n).reshape(groups, n, n)
+
+        image = np.ones((n, n, 3))
+        for code in range(groups):
+            peak = counts[code].max()
+            if peak == 0:
+                continue
+            alpha = (np.log1p(counts[code]) / np.log1p(peak))[..., None]
+            image = image * (1 - alpha) + self.colors[code] * alpha
+        return image
+
+    def frame(self):
+        """The current figure as an (height, width, 3) uint8 array."""
+        self.canvas.draw()
+        return np.asarray(self.canvas.buffer_rgba())[..., :3].copy()
+
+    def close(self):
+        self.figure.clear()
+        self.scatters = []
+
+
+def frame_strip(frames, columns=5):
+    """Tile frames into one image, row by row."""
+    height, width, depth = frames[0].shape
+    columns = min(columns, len(frames))
+    rows = -(-len(frames) // columns)
+    strip = np.full((rows * height, columns * width, depth), 255, dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        r, c = divmod(i, columns)
+        strip[r * height:(r + 1) * height, c * width:(c + 1) * width] = frame
+    return strip
+
+
+def save_animation(frames, path, fps=4):
+    """Write frames to a GIF, an MP4 (needs ffmpeg) or, for any other extension, a still frame strip."""
+    from PIL import Image
+
+    if str(path).lower().endswith(".mp4"):
+        from matplotlib.animation import FFMpegWriter
+
+        height, width, _ = frames[0].shape
+        figure = Figure(figsize=(width / 100, height / 100), dpi=100)
+        FigureCanvasAgg(figure)
+        ax = figure.add_axes([0, 0, 1, 1])
+        ax.set_axis_off()
+        image = ax.imshow(frames[0])
+        writer = FFMpegWriter(fps=fps)
+        with writer.saving(figure, path, dpi=100):
+            for frame in frames:
+                image.set_data(frame)
+                writer.grab_frame()
+        return path
+
+    if str(path).lower().endswith(".gif"):
+        with open(path, "wb") as f:
+            f.write(animation_bytes(frames, fps))
+        return path
+
+    Image.fromarray(frame_strip(frames)).save(path)
+    return path
+
+
+def animation_bytes(frames, fps=4):
+    """Frames encoded as an animated GIF, e.g. for st.image or a download button."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(buffer, format="GIF", save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+    return buffer.getvalue()
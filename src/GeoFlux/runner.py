@@ -0,0 +1,109 @@
+import threading
+
+
+class SimulationRun:
+    """Steps a City on a background thread and publishes a frame after every step.
+
+    All City and Renderer work happens on the worker thread; other threads
+    only call run(), cancel() and snapshot().  run(steps) on a finished run
+    continues the same City from where it stopped.  cancel() returns at
+    once and the worker stops after its current step.  With a ResultCache
+    and the key from cache.populate(), steps already cached are replayed
+    instead of computed.
+    """
+
+    def __init__(self, city, renderer=None, cache=None, key=None):
+        self.city = city
+        self.renderer = renderer
+        self.cache = cache
+        self.key = key
+        self.frames = []
+        self.target = city.step_count
+        self.error = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._running = False
+        self._thread = None
+        self._animation = None
+
+    @property
+    def running(self):
+        with self._lock:
+            return self._running
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self, steps):
+        """Queue steps more steps, starting the worker if it is idle."""
+        if self.cancelled:
+            raise RuntimeError("a cancelled run cannot be continued")
+        with self._lock:
+            self.target += steps
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._work, name="GeoFlux-run", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _render(self, label):
+        if self.renderer is None:
+            return
+        profiler = self.city.profiler
+        if profiler is None:
+            self.renderer.update(self.city.population, label)
+            frame = self.renderer.frame()
+        else:
+            with profiler.phase("render"):
+                self.renderer.update(self.city.population, label)
+                frame = self.renderer.frame()
+        with self._lock:
+            self.frames.append(frame)
+            self._animation = None
+
+    def _work(self):
+        try:
+            if not self.frames:
+                self._render("Initial")
+            while not self._cancelled.is_set():
+                with self._lock:
+                    if self.city.step_count >= self.target:
+                        self._running = False
+                        return
+                if self.cache is not None:
+                    self.cache.step(self.city, self.key)
+                else:
+                    self.city.step()
+                self._render(self.city.step_count)
+        except Exception as error:
+            self.error = error
+        with self._lock:
+            self._running = False
+
+    def snapshot(self):
+        """(latest frame or None, steps done, steps queued, running) as one consistent read."""
+        with self._lock:
+            frame = self.frames[-1] if self.frames else None
+            return frame, self.city.step_count, self.target, self._running
+
+    def animation(self, fps=4):
+        """All frames so far as GIF bytes, encoded once per new frame."""
+        from .render import animation_bytes
+
+        with self._lock:
+            frames = list(self.frames)
+            if self._animation is not None or not frames:
+                return self._animation
+        encoded = animation_bytes(frames, fps)
+        with self._lock:
+            if len(self.frames) == len(frames):
+                self._animation = encoded
+        return encoded
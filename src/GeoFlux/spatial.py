@@ -0,0 +1,88 @@
+from itertools import chain
+import numpy as np
+
+# Upper bound on the number of candidate pairs held in memory at once.
+BLOCK_PAIRS = 1 << 20
+
+
+class SpatialGrid:
+    """Uniform spatial hash of family indices, updated as families move."""
+
+    def __init__(self, x, y, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self._ci = np.floor(np.asarray(x) / self.cell_size).astype(np.int64)
+        self._cj = np.floor(np.asarray(y) / self.cell_size).astype(np.int64)
+
+        order = np.lexsort((self._cj, self._ci))
+        ci, cj = self._ci[order], self._cj[order]
+        breaks = np.flatnonzero((np.diff(ci) != 0) | (np.diff(cj) != 0)) + 1
+        for members in np.split(order, breaks):
+            if len(members):
+                self.cells[(int(self._ci[members[0]]), int(self._cj[members[0]]))] = set(members.tolist())
+
+    def cell_of(self, x, y):
+        return int(np.floor(x / self.cell_size)), int(np.floor(y / self.cell_size))
+
+    def move(self, index, x, y):
+        old = (int(self._ci[index]), int(self._cj[index]))
+        new = self.cell_of(x, y)
+        if new == old:
+            return
+        members = self.cells[old]
+        members.discard(index)
+        if not members:
+            del self.cells[old]
+        self.cells.setdefault(new, set()).add(index)
+        self._ci[index], self._cj[index] = new
+
+    def near(self, x, y, radius):
+        """Indices in every cell overlapping the square of half-width ``radius`` around (x, y)."""
+        i0, j0 = self.cell_of(x - radius, y - radius)
+        i1, j1 = self.cell_of(x + radius, y + radius)
+        cells = self.cells
+        found = chain.from_iterable(cells.get((i, j), ()) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1))
+        return np.fromiter(found, dtype=np.intp)
+
+
+def close_pairs(x, y, radius, block_pairs=BLOCK_PAIRS):
+    """Index arrays (i, j), i < j, of every pair closer than radius, found through a cell list of that size."""
+    if len(x) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    ci = np.floor(x / radius).astype(np.int64)
+    cj = np.floor(y / radius).astype(np.int64)
+    ci -= ci.min() - 1
+    cj -= cj.min() - 1
+    width = int(cj.max()) + 2
+    key = ci * width + cj
+    order = np.argsort(key, kind="stable")
+    cells, starts, counts = np.unique(key[order], return_index=True, return_counts=True)
+
+    found_i, found_j = [], []
+    # Each cell against itself and four of its neighbors covers every adjacent pair once.
+    for di, dj in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        target = cells + di * width + dj
+        pos = np.minimum(np.searchsorted(cells, target), len(cells) - 1)
+        a = np.flatnonzero(cells[pos] == target)
+        b = pos[a]
+        if len(a) == 0:
+            continue
+        sizes = counts[a] * counts[b]
+        cumulative = np.cumsum(sizes)
+        splits = np.searchsorted(cumulative, np.arange(block_pairs, cumulative[-1], block_pairs), side="right")
+        splits = np.unique(np.concatenate(([0], splits, [len(a)])))
+        for lo, hi in zip(splits[:-1], splits[1:]):
+            ca, cb, n = a[lo:hi], b[lo:hi], sizes[lo:hi]
+            offset = np.repeat(np.cumsum(n) - n, n)
+            local = np.arange(n.sum()) - offset
+            nb = np.repeat(counts[cb], n)
+            i = order[np.repeat(starts[ca], n) + local // nb]
+            j = order[np.repeat(starts[cb], n) + local % nb]
+            keep = (x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 < radius * radius
+            if (di, dj) == (0, 0):
+                keep &= i < j
+            found_i.append(np.minimum(i[keep], j[keep]))
+            found_j.append(np.maximum(i[keep], j[keep]))
+    if not found_i:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    return np.concatenate(found_i), np.concatenate(found_j)
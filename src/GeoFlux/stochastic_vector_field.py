@@ -1,46 +1,242 @@
 import numpy as np
+from .barnes_hut import BarnesHutTree
+from .population import GROUPS
+from .spatial import BLOCK_PAIRS, SpatialGrid, close_pairs
+
+# Strength of the pull a family of the row race feels towards a neighbor of
+# the column race (negative values repel), indexed by Population group code.
+INTERACTION = np.array([[0.0005, -0.001],
+                        [0.00005, 0.0001]])
+NOISE_SIGMA = 0.05
+CENTER_PULL = 0.001
+
+
+class ForceRules:
+    """Coefficients of the force field for K groups: pair interaction, noise sigma and center pull.
+
+    interaction is a K x K matrix indexed by Population group code; noise and
+    center_pull are either one value for every group or one value per group.
+    groups names the K groups in code order and defaults to white, black.
+    """
+
+    def __init__(self, interaction=INTERACTION, noise=NOISE_SIGMA, center_pull=CENTER_PULL, groups=None):
+        self.interaction = np.asarray(interaction, dtype=float)
+        k = len(self.interaction)
+        if self.interaction.shape != (k, k):
+            raise ValueError(f"interaction must be a square matrix, got shape {self.interaction.shape}")
+        if groups is None:
+            if k != len(GROUPS):
+                raise ValueError(f"name the {k} groups of a {k} x {k} interaction matrix")
+            groups = GROUPS
+        self.groups = tuple(groups)
+        if len(self.groups) != k:
+            raise ValueError(f"{len(self.groups)} group names for a {k} x {k} interaction matrix")
+        self.noise = self._per_group(noise, "noise")
+        self.center_pull = self._per_group(center_pull, "center_pull")
+
+    def _per_group(self, value, name):
+        if np.ndim(value) == 0:
+            return float(value)
+        value = np.asarray(value, dtype=float)
+        if value.shape != (len(self.groups),):
+            raise ValueError(f"{name} needs one value or one per group, got shape {value.shape}")
+        return value
+
+    def sigma(self, codes):
+        """Noise sigma of families with the given group codes (a scalar if it is shared)."""
+        return self.noise if np.ndim(self.noise) == 0 else self.noise[codes]
+
+    def pull(self, codes):
+        """Center pull of families with the given group codes (a scalar if it is shared)."""
+        return self.center_pull if np.ndim(self.center_pull) == 0 else self.center_pull[codes]
+
+    @classmethod
+    def two_group(cls, white_white=0.0005, white_black=-0.001, black_white=0.00005, black_black=0.0001,
+                  noise=NOISE_SIGMA, center_pull=CENTER_PULL):
+        """Rules from the four race-pair coefficients, named <family race>_<neighbor race>."""
+        return cls([[white_white, white_black], [black_white, black_black]], noise, center_pull, GROUPS)
+
+    @classmethod
+    def from_table(cls, interaction, noise=NOISE_SIGMA, center_pull=CENTER_PULL):
+        """Rules from ``{group: {neighbor group: coefficient}}``; missing pairs are 0.
+
+        noise and center_pull may be dicts by group, with missing groups at
+        the defaults.
+        """
+        groups = tuple(dict.fromkeys([*interaction, *(g for row in interaction.values() for g in row)]))
+        matrix = [[interaction.get(a, {}).get(b, 0.0) for b in groups] for a in groups]
+        if isinstance(noise, dict):
+            noise = [noise.get(group, NOISE_SIGMA) for group in groups]
+        if isinstance(center_pull, dict):
+            center_pull = [center_pull.get(group, CENTER_PULL) for group in groups]
+        return cls(matrix, noise, center_pull, groups)
+
+
+def pair_forces(tx, ty, tcodes, sx, sy, scodes, interaction=INTERACTION, cutoff=None,
+                block_pairs=BLOCK_PAIRS):
+    force = np.zeros((len(tx), 2))
+    counts = np.zeros(len(tx), dtype=np.int64)
+    if len(tx) == 0 or len(sx) == 0:
+        return force, counts
+
+    rows = max(1, block_pairs // len(sx))
+    for start in range(0, len(tx), rows):
+        stop = min(start + rows, len(tx))
+        dx = sx[None, :] - tx[start:stop, None]
+        dy = sy[None, :] - ty[start:stop, None]
+        d2 = dx * dx + dy * dy
+        distance = np.sqrt(d2)
+        apart = distance > 0
+        interacting = apart if cutoff is None else apart & (distance < cutoff)
+
+        # direction / distance * effect, with effect = 1 / (distance² + 1e-6)
+        coef = interaction[tcodes[start:stop, None], scodes[None, :]]
+        weight = np.divide(coef, distance * (d2 + 1e-6), out=np.zeros_like(d2), where=interacting)
+
+        force[start:stop, 0] = (weight * dx).sum(axis=1)
+        force[start:stop, 1] = (weight * dy).sum(axis=1)
+        counts[start:stop] = apart.sum(axis=1)
+    return force, counts
+
+
+def center_forces(tx, ty, center_x, center_y, pull=CENTER_PULL):
+    dx = center_x - tx
+    dy = center_y - ty
+    d2 = dx * dx + dy * dy
+    distance = np.sqrt(d2)
+    weight = np.divide(pull, distance * (d2 + 1e-6), out=np.zeros_like(d2), where=distance > 0)
+    return np.column_stack((weight * dx, weight * dy))
+
+
+def cutoff_forces(x, y, codes, interaction=INTERACTION, cutoff=1.0):
+    """pair_forces of every family against all others within cutoff, from a cell list instead of all pairs."""
+    n = len(x)
+    i, j = close_pairs(x, y, cutoff)
+    dx = x[j] - x[i]
+    dy = y[j] - y[i]
+    d2 = dx * dx + dy * dy
+    apart = d2 > 0
+    i, j, dx, dy, d2 = i[apart], j[apart], dx[apart], dy[apart], d2[apart]
+    scale = np.sqrt(d2) * (d2 + 1e-6)
+    # i feels j along (dx, dy), j feels i along (-dx, -dy).
+    w_ij = interaction[codes[i], codes[j]] / scale
+    w_ji = interaction[codes[j], codes[i]] / scale
+    # bincount of no pairs is int64 even with weights.
+    force = np.column_stack((
+        np.bincount(i, w_ij * dx, n) - np.bincount(j, w_ji * dx, n),
+        np.bincount(i, w_ij * dy, n) - np.bincount(j, w_ji * dy, n),
+    )).astype(float)
+
+    # Every family except those sharing its exact position counts as a source.
+    _, inverse, same = np.unique(np.column_stack((x, y)), axis=0, return_inverse=True, return_counts=True)
+    return force, n - same[inverse.ravel()]
+
+
+def neighbor_forces(tx, ty, tcodes, x, y, codes, groups=2, cutoff=None, theta=None, interaction=INTERACTION):
+    if theta is not None:
+        return BarnesHutTree(x, y, codes, groups).forces(tx, ty, tcodes, interaction, theta)
+    return pair_forces(tx, ty, tcodes, x, y, codes, interaction, cutoff)
+
+
+def truncation_error(x, y, codes, cutoff, targets, interaction=INTERACTION, block_pairs=BLOCK_PAIRS):
+    """Compare cutoff neighbor forces with the exact all-pairs forces on ``targets``."""
+    tx, ty, tcodes = x[targets], y[targets], codes[targets]
+    exact, _ = pair_forces(tx, ty, tcodes, x, y, codes, interaction, block_pairs=block_pairs)
+    truncated, _ = pair_forces(tx, ty, tcodes, x, y, codes, interaction, cutoff, block_pairs)
+    error = np.hypot(*(exact - truncated).T)
+    magnitude = np.hypot(*exact.T)
+
+    # Every pair beyond the cutoff contributes at most |coefficient| / cutoff².
+    outside = np.zeros(len(tx), dtype=np.int64)
+    rows = max(1, block_pairs // max(1, len(x)))
+    for start in range(0, len(tx), rows):
+        stop = min(start + rows, len(tx))
+        d2 = (x[None, :] - tx[start:stop, None]) ** 2 + (y[None, :] - ty[start:stop, None]) ** 2
+        outside[start:stop] = (d2 >= cutoff * cutoff).sum(axis=1)
+    bound = np.abs(interaction).max() * outside / (cutoff**2 + 1e-6)
+    return {
+        "families": len(tx),
+        "max_error": float(error.max(initial=0.0)),
+        "mean_error": float(error.mean()) if len(tx) else 0.0,
+        "relative_error": float(error.sum() / magnitude.sum()) if magnitude.sum() > 0 else 0.0,
+        "error_bound": float(bound.max(initial=0.0)),
+    }
+
 
 class StochasticVectorField2D:
-    def __init__(self, city, family):
+    def __init__(self, city, family=None):
         self.city = city
         self.family = family
+        self.noise = None
+        self._grid = None
 
-    def compute_vector(self):
-        vector = np.array([0.0, 0.0])
-        for f in self.city.families.values():
-            if f == self.family:
-                continue
-
-            direction = np.array([f.x - self.family.x, f.y - self.family.y])
-            distance = np.linalg.norm(direction)
-            if distance == 0:
-                continue
-            direction = direction / distance
-            effect = 1.0 / (distance**2 + 1e-6)
+    @property
+    def grid(self):
+        """SpatialGrid of the cutoff neighborhoods for per-family queries, or None without a cutoff."""
+        if self._grid is None and self.city.cutoff is not None:
+            x, y, _ = self.arrays()
+            self._grid = SpatialGrid(x, y, self.city.cutoff)
+        return self._grid
 
-            if (f.race == "black" and self.family.race == "white"):
-                vector -= 0.001 * effect * direction
-            if (f.race == "white" and self.family.race == "white"):
-                vector += 0.0005 * effect * direction
+    def arrays(self):
+        population = self.city.population
+        return population.x, population.y, population.codes
 
-            if (f.race == "black" and self.family.race == "black"):
-                vector += 0.0001 * effect * direction
-            if (f.race == "white" and self.family.race == "black"):
-                vector += 0.00005 * effect * direction
+    def step_noise(self):
+        """Standard normal noise for every family, drawn in one call per step."""
+        if self.noise is None:
+            self.noise = self.city.rng.standard_normal((len(self.city.population), 2))
+        return self.noise
 
-            vector += np.random.normal(0, 0.05, 2)
+    def vectors_for(self, tx, ty, tcodes, x, y, codes, total=None, noise=None):
+        force, counts = neighbor_forces(tx, ty, tcodes, x, y, codes, len(self.city.population.groups),
+                                        self.city.cutoff, self.city.theta, self.city.rules.interaction)
+        # Families left out of the sources by the cutoff still count as neighbors.
+        if total is not None:
+            counts += total - len(x)
+        return self.add_noise_and_center(force, counts, tx, ty, tcodes, noise)
 
-        center = self.city.city_boundary.centroid
-        center_x, center_y = center.x, center.y
+    def add_noise_and_center(self, force, counts, tx, ty, tcodes, noise=None):
+        rules = self.city.rules
+        # Each neighbor adds N(0, sigma) noise, so the summed noise of a family
+        # is N(0, sigma * sqrt(neighbors)).
+        if noise is None:
+            noise = self.city.rng.standard_normal(force.shape)
+        force += np.reshape(rules.sigma(tcodes), (-1, 1)) * noise * np.sqrt(counts)[:, None]
 
         # Add a force towards the center of the city
-        direction = np.array([center_x - self.family.x, center_y - self.family.y])
-        distance = np.linalg.norm(direction)
-        if distance == 0:
-            return vector
-        direction = direction / distance
+        center_x, center_y = self.city.boundary.center
+        force += center_forces(tx, ty, center_x, center_y, rules.pull(tcodes))
+        return force
+
+    def vector_at(self, i):
+        x, y, codes = self.arrays()
+        if self.grid is None:
+            return self.vectors_for(x[i:i + 1], y[i:i + 1], codes[i:i + 1], x, y, codes,
+                                    noise=self.step_noise()[i:i + 1])[0]
+        near = self.grid.near(x[i], y[i], self.city.cutoff)
+        return self.vectors_for(x[i:i + 1], y[i:i + 1], codes[i:i + 1],
+                                x[near], y[near], codes[near], total=len(x), noise=self.step_noise()[i:i + 1])[0]
 
-        effect = 1.0 / (distance**2 + 1e-6)
-        vector += 0.001 * effect * direction
+    def moved(self, i):
+        if self.grid is not None:
+            x, y, _ = self.arrays()
+            self.grid.move(i, x[i], y[i])
+
+    def compute_vector(self):
+        x, y, codes = self.arrays()
+        tx = np.array([self.family.x], dtype=float)
+        ty = np.array([self.family.y], dtype=float)
+        tcodes = np.array([self.city.population.code_of(self.family.race)], dtype=np.int8)
+        if self.grid is None:
+            return self.vectors_for(tx, ty, tcodes, x, y, codes)[0]
+        near = self.grid.near(tx[0], ty[0], self.city.cutoff)
+        return self.vectors_for(tx, ty, tcodes, x[near], y[near], codes[near], total=len(x))[0]
 
-        return vector
+    def compute_vectors(self):
+        """Vectors of every family from the current positions, as one array operation."""
+        x, y, codes = self.arrays()
+        if self.city.cutoff is not None and self.city.theta is None:
+            force, counts = cutoff_forces(x, y, codes, self.city.rules.interaction, self.city.cutoff)
+            return self.add_noise_and_center(force, counts, x, y, codes, self.step_noise())
+        return self.vectors_for(x, y, codes, x, y, codes, noise=self.step_noise())
@@ -0,0 +1,28 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+
+def stable_hash(params, boundary_wkb=b"", length=20):
+    """Hex digest of JSON-serializable params and a boundary's WKB, stable across processes."""
+    payload = json.dumps(params, sort_keys=True, default=float).encode()
+    return hashlib.sha256(hashlib.sha256(boundary_wkb).digest() + payload).hexdigest()[:length]
+
+
+@contextmanager
+def atomic_path(path, suffix=""):
+    """A temporary path to write to, moved over path once the block succeeds.
+
+    Readers never see a partial file, and the temporary name is unique per
+    process and thread.  suffix keeps writers that append an extension
+    (np.savez adds .npz) writing to the yielded name.
+    """
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp{suffix}"
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,104 @@
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import shapely
+from .ensemble import run_replicate
+from .stochastic_vector_field import ForceRules
+from .storage import atomic_path, stable_hash
+
+# Defaults match the Streamlit sidebar and the coefficients in ForceRules.
+DEFAULTS = {
+    "wp": 400,
+    "bp": 20,
+    "min_distance": 0.1,
+    "exclusion": None,
+    "max_step_size": 0.1,
+    "steps": 10,
+    "white_white": 0.0005,
+    "white_black": -0.001,
+    "black_white": 0.00005,
+    "black_black": 0.0001,
+    "noise": 0.05,
+    "center_pull": 0.001,
+    "seed": 0,
+}
+INTEGER_PARAMETERS = {"wp", "bp", "steps", "seed"}
+# Part of every cache key; bump it when run_point's result arrays change.
+RESULT_FORMAT = 2
+RULE_PARAMETERS = ("white_white", "white_black", "black_white", "black_black", "noise", "center_pull")
+
+
+def grid_design(space):
+    """Every combination of the listed values, e.g. ``{"wp": [100, 400], "noise": [0.01, 0.05]}``."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def latin_hypercube(space, n, seed=None):
+    """n points with each ``name: (low, high)`` range split into n strata sampled once each."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in space.items():
+        u = (rng.permutation(n) + rng.random(n)) / n
+        values = low + u * (high - low)
+        columns[name] = np.rint(values).astype(int).tolist() if name in INTEGER_PARAMETERS else values.tolist()
+    return [{name: columns[name][i] for name in space} for i in range(n)]
+
+
+def param_hash(params, boundary_wkb=b""):
+    return stable_hash(params, boundary_wkb)
+
+
+def _key(params):
+    """The parameters that change a run: min_distance does nothing without an exclusion policy."""
+    p = {**DEFAULTS, **params}
+    if p["exclusion"] is None:
+        p["min_distance"] = None
+    return p
+
+
+def run_point(boundary_wkb, params):
+    p = {**DEFAULTS, **params}
+    rules = ForceRules.two_group(**{name: p[name] for name in RULE_PARAMETERS})
+    city_kwargs = {"min_distance": p["min_distance"], "exclusion": p["exclusion"], "max_step_size": p["max_step_size"],
+                   "rules": rules}
+    centroids, radial, dissimilarity, exposure, edges = run_replicate(boundary_wkb, p["wp"], p["bp"], p["steps"],
+                                                                      p["seed"], city_kwargs)
+    return {"centroids": centroids, "radial": radial, "dissimilarity": dissimilarity, "exposure": exposure,
+            "radial_edges": edges}
+
+
+def _save(path, params, result):
+    with atomic_path(path, ".npz") as tmp:
+        np.savez(tmp, params=json.dumps(params, sort_keys=True, default=float), **result)
+
+
+def load_result(path):
+    with np.load(path) as data:
+        result = {name: data[name] for name in data.files if name != "params"}
+        return json.loads(str(data["params"])), result
+
+
+def run_sweep(city_boundary, design, cache_dir, workers=None):
+    """Run every design point, caching each finished run on disk.
+
+    Points whose result is already in ``cache_dir`` are loaded instead of
+    recomputed, so an interrupted sweep resumes where it stopped. Returns
+    ``(params, result)`` pairs in design order.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    wkb = shapely.to_wkb(city_boundary)
+    paths = [os.path.join(cache_dir, f"{param_hash({**_key(params), 'format': RESULT_FORMAT}, wkb)}.npz") for params in design]
+    pending = {path: params for path, params in zip(paths, design) if not os.path.exists(path)}
+
+    if pending:
+        workers = min(workers or os.cpu_count(), len(pending))
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {pool.submit(run_point, wkb, params): path for path, params in pending.items()}
+            for future in as_completed(futures):
+                path = futures[future]
+                _save(path, _key(pending[path]), future.result())
+
+    return [load_result(path) for path in paths]
@@ -0,0 +1,138 @@
+import json
+import os
+import pickle
+import numpy as np
+import shapely
+from .population import Population
+from .storage import atomic_path
+
+META = "trajectory.json"
+
+
+def _write_meta(directory, meta):
+    # Replaced atomically: a crash mid-write must not lose every chunk.
+    with atomic_path(os.path.join(directory, META)) as tmp, open(tmp, "w") as f:
+        json.dump(meta, f)
+
+
+class TrajectoryStore:
+    """Per-step positions and group codes in chunked, memory-mapped .npy files.
+
+    Chunk k holds steps [k * chunk_steps, (k + 1) * chunk_steps) as
+    ``positions_k.npy`` (steps, families, 2) and ``codes_k.npy`` (steps,
+    families). Only the chunk being read or written is mapped, so the
+    trajectory never has to fit in RAM.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META)) as f:
+            self.meta = json.load(f)
+        self._chunk = (None, None, None)
+
+    @classmethod
+    def create(cls, directory, size, groups, dtype=np.float64, chunk_steps=64):
+        """An empty store in directory, replacing the chunks of any store already there."""
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".npy") and name.startswith(("positions_", "codes_")):
+                os.remove(os.path.join(directory, name))
+        meta = {"size": size, "groups": list(groups), "dtype": np.dtype(dtype).str,
+                "chunk_steps": chunk_steps, "steps": 0}
+        _write_meta(directory, meta)
+        return cls(directory)
+
+    def __len__(self):
+        return self.meta["steps"]
+
+    @property
+    def groups(self):
+        return tuple(self.meta["groups"])
+
+    def _paths(self, chunk):
+        return (os.path.join(self.directory, f"positions_{chunk:05d}.npy"),
+                os.path.join(self.directory, f"codes_{chunk:05d}.npy"))
+
+    def _open(self, chunk, write=False):
+        if self._chunk[0] == chunk and (not write or self._chunk[1].mode == "r+"):
+            return self._chunk[1], self._chunk[2]
+        positions_path, codes_path = self._paths(chunk)
+        steps, size = self.meta["chunk_steps"], self.meta["size"]
+        if write and not os.path.exists(positions_path):
+            positions = np.lib.format.open_memmap(positions_path, "w+", self.meta["dtype"], (steps, size, 2))
+            codes = np.lib.format.open_memmap(codes_path, "w+", np.int8, (steps, size))
+        else:
+            mode = "r+" if write else "r"
+            positions = np.lib.format.open_memmap(positions_path, mode)
+            codes = np.lib.format.open_memmap(codes_path, mode)
+        self._chunk = (chunk, positions, codes)
+        return positions, codes
+
+    def append(self, population):
+        if len(population) != self.meta["size"]:
+            raise ValueError(f"store holds {self.meta['size']} families, population has {len(population)}")
+        chunk, row = divmod(self.meta["steps"], self.meta["chunk_steps"])
+        positions, codes = self._open(chunk, write=True)
+        positions[row, :, 0] = population.x
+        positions[row, :, 1] = population.y
+        codes[row] = population.codes
+        positions.flush()
+        codes.flush()
+        self.meta["steps"] += 1
+        _write_meta(self.directory, self.meta)
+
+    def _locate(self, step):
+        if not -len(self) <= step < len(self):
+            raise IndexError(step)
+        return divmod(step % len(self), self.meta["chunk_steps"])
+
+    def positions(self, step):
+        """(families, 2) memory-mapped positions at a recorded step."""
+        chunk, row = self._locate(step)
+        return self._open(chunk)[0][row]
+
+    def codes(self, step):
+        chunk, row = self._locate(step)
+        return self._open(chunk)[1][row]
+
+    def population(self, step):
+        """The recorded step as a Population, for rendering or metrics."""
+        positions = self.positions(step)
+        population = Population(self.groups, self.meta["dtype"])
+        codes = self.codes(step)
+        for code, group in enumerate(self.groups):
+            members = codes == code
+            population.extend(group, positions[members, 0], positions[members, 1])
+        return population
+
+
+# City constructor arguments restored from a checkpoint.
+_CITY_FIELDS = ("wp", "bp", "min_distance", "max_step_size", "cutoff", "cutoff_sample", "theta", "workers",
+                "seed", "rules", "exclusion", "update", "populations", "boundary_resolution")
+
+
+def save_checkpoint(city, path):
+    """Write everything needed to resume a City, including its RNG state."""
+    state = {
+        "city": {name: getattr(city, name) for name in _CITY_FIELDS},
+        "boundary": shapely.to_wkb(city.city_boundary),
+        "population": city.population.state(),
+        "step_count": city.step_count,
+        "rng": city.rng.bit_generator.state,
+    }
+    with atomic_path(path) as tmp, open(tmp, "wb") as f:
+        pickle.dump(state, f)
+
+
+def load_checkpoint(path, boundary=None):
+    """The City saved at path; boundary may be a prebuilt CityBoundary of the same geometry to reuse."""
+    from .city import City
+
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    city = City(city_boundary=boundary or shapely.from_wkb(state["boundary"]), **state["city"])
+    city.population = Population.from_state(state["population"])
+    city.families.population = city.population
+    city.step_count = state["step_count"]
+    city.rng.bit_generator.state = state["rng"]
+    return city
@@ -0,0 +1,25 @@
+import numpy as np
+from src.GeoFlux.barnes_hut import BarnesHutTree
+from src.GeoFlux.stochastic_vector_field import INTERACTION, pair_forces
+
+
+def scatter(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.random(n), rng.random(n), rng.integers(0, 2, n).astype(np.int8)
+
+
+def test_barnes_hut_without_approximation_is_exact():
+    x, y, codes = scatter(500, seed=1)
+    force, counts = pair_forces(x, y, codes, x, y, codes)
+    tree_force, tree_counts = BarnesHutTree(x, y, codes, 2).forces(x, y, codes, INTERACTION, theta=0.0)
+    assert np.allclose(tree_force, force, rtol=1e-9, atol=1e-12 * np.abs(force).max())
+    assert np.array_equal(tree_counts, counts)
+
+
+def test_barnes_hut_error_shrinks_with_theta():
+    x, y, codes = scatter(2000, seed=4)
+    exact, _ = pair_forces(x, y, codes, x, y, codes)
+    tree = BarnesHutTree(x, y, codes, 2)
+    errors = [np.abs(tree.forces(x, y, codes, INTERACTION, theta)[0] - exact).max() for theta in (1.0, 0.5, 0.25)]
+    assert errors[0] >= errors[1] >= errors[2]
+    assert errors[1] < 0.05 * np.abs(exact).max()
@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import pytest
+import shapely
+from src.GeoFlux.boundary import BoundaryField, CityBoundary
+from src.GeoFlux.catalog import BoundaryCatalog
+from src.GeoFlux.city import City
+
+SHAPEFILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "ex_gis", "cb_2018_us_csa_500k.shp")
+
+
+@pytest.fixture(scope="module")
+def houston(tmp_path_factory):
+    catalog = BoundaryCatalog.open(SHAPEFILE, str(tmp_path_factory.mktemp("catalog") / "csa.parquet"))
+    geometry = catalog.geometry("Houston-The Woodlands, TX", 0.005)
+    assert geometry.geom_type == "MultiPolygon"
+    return geometry
+
+
+def points_around(geometry, n, seed=0):
+    rng = np.random.default_rng(seed)
+    x0, y0, x1, y1 = geometry.bounds
+    margin = 0.3 * max(x1 - x0, y1 - y0)
+    return rng.uniform(x0 - margin, x1 + margin, n), rng.uniform(y0 - margin, y1 + margin, n)
+
+
+def test_field_contains_matches_shapely(houston):
+    field = BoundaryField(houston, houston.boundary, 128)
+    x, y = points_around(houston, 20000)
+    assert np.array_equal(field.contains(x, y), shapely.contains_xy(houston, x, y))
+    x, y = x[:200], y[:200]
+    assert [field.contains(a, b) for a, b in zip(x, y)] == list(shapely.contains_xy(houston, x, y))
+
+
+def test_field_project_matches_shortest_line(houston):
+    exact, rasterized = CityBoundary(houston), CityBoundary(houston, 128)
+    x, y = points_around(houston, 5000, seed=1)
+    assert np.allclose(rasterized.project(x, y), exact.project(x, y), rtol=0, atol=1e-12)
+    for a, b in zip(x[:100], y[:100]):
+        assert np.allclose(rasterized.project(a, b), exact.project(a, b), rtol=0, atol=1e-12)
+
+
+def test_city_reuses_a_prebuilt_boundary(houston):
+    boundary = CityBoundary(houston, 64)
+    city = City(10, 2, boundary, seed=1)
+    assert city.boundary is boundary and city.boundary_resolution == 64
+    with pytest.raises(ValueError):
+        City(10, 2, boundary, boundary_resolution=128)
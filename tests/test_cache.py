@@ -0,0 +1,47 @@
+import numpy as np
+import shapely
+from src.GeoFlux.cache import ResultCache
+from src.GeoFlux.city import City
+
+SQUARE = shapely.box(0, 0, 1, 1)
+
+
+def new_city():
+    return City(30, 5, SQUARE, seed=6, max_step_size=0.05)
+
+
+def uncached(steps):
+    city = new_city()
+    city.populate()
+    for _ in range(steps):
+        city.step()
+    return city
+
+
+def same(a, b):
+    return (np.array_equal(a.population.x, b.population.x) and np.array_equal(a.population.y, b.population.y)
+            and a.rng.bit_generator.state == b.rng.bit_generator.state)
+
+
+def test_fresh_cache_resumes_a_run_from_disk(tmp_path):
+    ResultCache(tmp_path).run(new_city(), 3)
+    cache = ResultCache(tmp_path)
+    city = cache.run(new_city(), 6)
+    assert cache.hits == 2 and city.step_count == 6
+    assert same(city, uncached(6))
+    city.step()
+    assert same(city, uncached(7))
+
+
+def test_replay_from_memory_after_eviction():
+    cache = ResultCache(max_bytes=3 * 35 * 8 * 2)
+    reference = cache.run(new_city(), 5)
+    # Step 0 is needed to restore any later step, so it outlives them.
+    assert sorted(step for _, step in cache.memory) == [0, 4, 5]
+
+    cache.hits = 0
+    city = cache.run(new_city(), 5)
+    assert cache.hits == 2 and city.step_count == 5
+    assert same(city, reference) and same(city, uncached(5))
+    city.step()
+    assert same(city, uncached(6))
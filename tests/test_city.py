@@ -0,0 +1,53 @@
+import numpy as np
+import shapely
+from src.GeoFlux.city import City
+from src.GeoFlux.stochastic_vector_field import ForceRules
+
+SQUARE = shapely.box(0, 0, 1, 1)
+
+
+def test_populate_again_replaces_the_families():
+    city = City(40, 4, SQUARE, seed=4)
+    city.populate()
+    city.step()
+    city.populate()
+    assert len(city.population) == len(city.families) == 44
+    assert city.step_count == 0
+    assert sorted(city.families)[:2] == ["b0", "b1"]
+
+
+def trajectory(seed, update):
+    city = City(40, 4, SQUARE, seed=seed, max_step_size=0.05, update=update)
+    city.populate()
+    for _ in range(3):
+        city.step()
+    return city.population.x.copy()
+
+
+def test_seed_reproduces_the_run():
+    for update in ("sequential", "synchronous"):
+        assert np.array_equal(trajectory(8, update), trajectory(8, update))
+        assert not np.array_equal(trajectory(8, update), trajectory(9, update))
+
+
+def permuted_step(update, order):
+    """One noiseless step of the same families stored in the given order, as {id: (x, y)}."""
+    source = City(30, 10, SQUARE, seed=12)
+    source.populate()
+    city = City(30, 10, SQUARE, rules=ForceRules(noise=0.0), max_step_size=0.05, update=update)
+    ids = list(source.population.ids())
+    for i in order:
+        city.population.add(source.population.groups[source.population.codes[i]],
+                            source.population.x[i], source.population.y[i], ids[i])
+    city.step()
+    return {id: (city.population.x[i], city.population.y[i]) for i, id in enumerate(city.population.ids())}
+
+
+def test_synchronous_step_ignores_family_order():
+    order = np.random.default_rng(0).permutation(40)
+    forward, shuffled = permuted_step("synchronous", range(40)), permuted_step("synchronous", order)
+    assert forward.keys() == shuffled.keys()
+    assert all(np.allclose(forward[id], shuffled[id], rtol=0, atol=1e-12) for id in forward)
+
+    forward, shuffled = permuted_step("sequential", range(40)), permuted_step("sequential", order)
+    assert not all(np.allclose(forward[id], shuffled[id], rtol=0, atol=1e-12) for id in forward)
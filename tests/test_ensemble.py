@@ -0,0 +1,32 @@
+import numpy as np
+import shapely
+from src.GeoFlux.city import City
+from src.GeoFlux.ensemble import run_ensemble, run_replicate
+from src.GeoFlux.stochastic_vector_field import ForceRules
+
+SQUARE = shapely.box(0, 0, 1, 1)
+RULES = ForceRules([[0.0005, -0.001, 0.0], [0.00005, 0.0001, 0.0], [0.0, 0.0, 0.0002]],
+                   groups=("white", "black", "asian"))
+KWARGS = {"rules": RULES, "populations": {"white": 40, "black": 10, "asian": 10}, "max_step_size": 0.05}
+
+
+def test_replicate_indices_match_city_metrics():
+    _, _, dissimilarity, exposure, _ = run_replicate(shapely.to_wkb(SQUARE), None, None, 2, 11, KWARGS,
+                                                     cell_size=0.1)
+    city = City(None, None, SQUARE, seed=11, **KWARGS)
+    city.populate()
+    metrics = city.track_metrics(0.1)
+    for _ in range(2):
+        city.step()
+    for step, row in enumerate(metrics.records):
+        assert dissimilarity[step, 0, 2] == dissimilarity[step, 2, 0] == row["dissimilarity_white_asian"]
+        assert dissimilarity[step, 1, 2] == row["dissimilarity_black_asian"]
+        assert exposure[step, 2, 0] == row["exposure_asian_white"]
+        assert exposure[step, 1, 1] == row["isolation_black"]
+
+
+def test_ensemble_covers_every_group_pair():
+    result = run_ensemble(SQUARE, None, None, 2, 3, seed=0, workers=1, city_kwargs=KWARGS)
+    assert result.dissimilarity.shape == result.exposure.shape == (3, 3, 3, 3)
+    assert result.isolation_mean.shape == (3, 3)
+    assert np.allclose(result.exposure.sum(axis=3), 1)
@@ -0,0 +1,22 @@
+import numpy as np
+import shapely
+from src.GeoFlux.city import City
+from src.GeoFlux.exclusion import Exclusion
+
+SQUARE = shapely.box(0, 0, 1, 1)
+
+
+def test_resolve_all_of_empty_city():
+    for policy in ("reject", "shorten"):
+        city = City(0, 0, SQUARE, seed=1, exclusion=policy, update="synchronous")
+        city.populate()
+        city.step()
+        assert len(city.population) == 0
+
+
+def test_resolve_all_keeps_min_distance():
+    x, y = np.array([0.0, 1.0]), np.array([0.0, 0.0])
+    exclusion = Exclusion(0.5, "reject")
+    nx, ny = exclusion.resolve_all(x, y, np.array([0.4, 0.6]), np.array([0.0, 0.0]))
+    assert np.hypot(nx[1] - nx[0], ny[1] - ny[0]) >= 0.5
+    assert exclusion.rejected == 1
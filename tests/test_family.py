@@ -0,0 +1,23 @@
+import sys
+from src.GeoFlux.family import Family, FamilyMap
+from src.GeoFlux.population import Population
+
+
+def test_standalone_family_holds_its_values():
+    family = Family("white", 1, 2.5)
+    assert (family.race, family.x, family.y) == ("white", 1.0, 2.5)
+    assert not hasattr(family, "__dict__")
+    assert sys.getsizeof(family) < 100
+    family.x = 3
+    assert family.x == 3.0
+    assert family == family and family != Family("white", 3, 2.5)
+
+
+def test_adding_a_family_makes_it_a_view():
+    families = FamilyMap(Population())
+    family = Family("black", 0.5, 0.25)
+    families["b0"] = family
+    family.y = 0.75
+    assert families.population.y[0] == 0.75
+    assert families["b0"] == family
+    assert families["b0"].race == "black"
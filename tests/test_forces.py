@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+import shapely
+from src.GeoFlux.city import City
+from src.GeoFlux.spatial import close_pairs
+from src.GeoFlux.stochastic_vector_field import cutoff_forces, pair_forces, truncation_error
+
+SQUARE = shapely.box(0, 0, 1, 1)
+
+
+def test_close_pairs_of_nothing():
+    i, j = close_pairs(np.zeros(0), np.zeros(0), 0.1)
+    assert len(i) == len(j) == 0
+
+
+def test_cutoff_forces_without_pairs_are_float():
+    x, y = np.array([0.0, 0.5]), np.array([0.0, 0.5])
+    force, counts = cutoff_forces(x, y, np.zeros(2, dtype=np.int8), cutoff=0.1)
+    assert force.dtype == float
+    assert np.array_equal(force, np.zeros((2, 2)))
+    assert np.array_equal(counts, [1, 1])
+
+
+def test_synchronous_cutoff_step_without_pairs():
+    for wp, bp, cutoff in ((400, 20, 1e-5), (5, 0, 0.02)):
+        city = City(wp, bp, SQUARE, seed=1, cutoff=cutoff, update="synchronous")
+        city.populate()
+        city.step()
+        assert np.isfinite(city.population.x).all()
+
+
+def test_synchronous_cutoff_step_of_empty_city():
+    city = City(0, 0, SQUARE, seed=1, cutoff=0.1, update="synchronous")
+    city.populate()
+    city.step()
+    assert len(city.population) == 0
+
+
+def baseline_forces(x, y, races):
+    """The original per-pair loop of StochasticVectorField2D.compute_vector, without its noise."""
+    coefficient = {("white", "white"): 0.0005, ("white", "black"): -0.001,
+                   ("black", "white"): 0.00005, ("black", "black"): 0.0001}
+    force = np.zeros((len(x), 2))
+    for i in range(len(x)):
+        for j in range(len(x)):
+            direction = np.array([x[j] - x[i], y[j] - y[i]])
+            distance = np.linalg.norm(direction)
+            if i == j or distance == 0:
+                continue
+            effect = 1.0 / (distance ** 2 + 1e-6)
+            force[i] += coefficient[races[i], races[j]] * effect * direction / distance
+    return force
+
+
+def scatter(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.random(n), rng.random(n), rng.integers(0, 2, n).astype(np.int8)
+
+
+def test_pair_forces_match_the_baseline_loop():
+    x, y, codes = scatter(60)
+    # Two families on the same spot ignore each other.
+    x[1], y[1] = x[0], y[0]
+    force, counts = pair_forces(x, y, codes, x, y, codes)
+    expected = baseline_forces(x, y, [("white", "black")[c] for c in codes])
+    assert np.allclose(force, expected, rtol=1e-12, atol=0)
+    assert counts[0] == counts[1] == 58
+    assert (counts[2:] == 59).all()
+
+
+def test_cutoff_forces_match_pair_forces_with_cutoff():
+    x, y, codes = scatter(500, seed=2)
+    force, counts = pair_forces(x, y, codes, x, y, codes, cutoff=0.1)
+    cell_force, cell_counts = cutoff_forces(x, y, codes, cutoff=0.1)
+    assert np.allclose(cell_force, force, rtol=1e-9, atol=1e-12 * np.abs(force).max())
+    assert np.array_equal(cell_counts, counts)
+
+
+def test_truncation_error_in_blocks():
+    x, y, codes = scatter(300, seed=3)
+    targets = np.arange(0, 300, 7)
+    whole = truncation_error(x, y, codes, 0.2, targets)
+    blocked = truncation_error(x, y, codes, 0.2, targets, block_pairs=500)
+    assert whole == pytest.approx(blocked)
+    assert whole["max_error"] <= whole["error_bound"]
+
+
+def test_truncation_is_measured_on_request():
+    city = City(200, 20, SQUARE, seed=1, cutoff=0.05, update="synchronous")
+    city.populate()
+    city.step()
+    assert city.truncation is None
+    assert city.truncation_error(16)["families"] == 16
+    city.cutoff_sample = 16
+    city.step()
+    assert city.truncation["families"] == 16
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import shapely
+from src.GeoFlux.city import City
+from src.GeoFlux.metrics import cell_counts, dissimilarity_index, segregation_indices
+
+SQUARE = shapely.box(0, 0, 1, 1)
+
+
+def test_incremental_counts_match_a_rebin():
+    city = City(80, 20, SQUARE, seed=2, max_step_size=0.2)
+    city.populate("polygon")
+    metrics = city.track_metrics(0.1)
+    for _ in range(4):
+        city.step()
+        population = city.population
+        rebinned = cell_counts(population.x, population.y, population.codes, 2, city.boundary.bounds, 0.1)
+        assert np.array_equal(metrics.counts, rebinned)
+
+
+def test_indices_on_a_tiny_layout():
+    # Two cells: white 3 and 1, black 0 and 2.
+    counts = np.array([[3, 1], [0, 2]])
+    assert dissimilarity_index(counts) == pytest.approx(0.5 * (abs(3 / 4 - 0) + abs(1 / 4 - 2 / 2)))
+    dissimilarity, exposure = segregation_indices(counts)
+    assert dissimilarity[0, 1] == dissimilarity[1, 0] == pytest.approx(0.75)
+    # White: 3/4 live in an all-white cell, 1/4 in a cell that is 1/3 white.
+    assert exposure[0, 0] == pytest.approx(3 / 4 * 1 + 1 / 4 * 1 / 3)
+    assert exposure[1, 1] == pytest.approx(2 / 3)
+    assert exposure[0, 1] == pytest.approx(1 / 4 * 2 / 3)
+
+
+def test_record_matches_the_layout():
+    city = City(3, 2, SQUARE)
+    city.population.extend("white", np.array([0.05, 0.05, 0.05]), np.array([0.05, 0.05, 0.05]), "w")
+    city.population.extend("black", np.array([0.95, 0.95]), np.array([0.95, 0.95]), "b")
+    row = city.track_metrics(0.5).records[-1]
+    assert row["dissimilarity_white_black"] == 1.0
+    assert row["isolation_white"] == row["isolation_black"] == 1.0
+    assert row["exposure_white_black"] == 0.0
@@ -0,0 +1,28 @@
+import gc
+import numpy as np
+import shapely
+from src.GeoFlux.city import City
+
+SQUARE = shapely.box(0, 0, 1, 1)
+
+
+def test_stepper_released_without_close():
+    city = City(50, 5, SQUARE, seed=1, workers=2)
+    city.populate()
+    city.step()
+    finalizer = city.stepper._finalizer
+    del city
+    gc.collect()
+    assert not finalizer.alive
+
+
+def test_workers_match_synchronous_update():
+    runs = []
+    for kwargs in ({"update": "synchronous"}, {"workers": 2}):
+        with City(60, 6, SQUARE, seed=7, max_step_size=0.05, **kwargs) as city:
+            city.populate()
+            for _ in range(3):
+                city.step()
+            runs.append(city.population)
+    assert np.allclose(runs[0].x, runs[1].x, rtol=0, atol=1e-12)
+    assert np.allclose(runs[0].y, runs[1].y, rtol=0, atol=1e-12)
@@ -0,0 +1,26 @@
+import shapely
+from src.GeoFlux.boundary import CityBoundary
+from src.GeoFlux.city import City
+
+SQUARE = shapely.box(0, 0, 1, 1)
+
+
+def escapes(city, other=None):
+    city.populate()
+    profiler = city.profile()
+    for _ in range(3):
+        city.step()
+        if other is not None:
+            other.step()
+    return [(row["escapes"], row["projections"]) for row in profiler.records]
+
+
+def test_shared_boundary_counts_per_city():
+    kwargs = {"seed": 3, "max_step_size": 0.5}
+    alone = escapes(City(60, 6, SQUARE, **kwargs))
+    boundary = CityBoundary(SQUARE)
+    other = City(60, 6, boundary, **kwargs)
+    other.populate()
+    shared = escapes(City(60, 6, boundary, **kwargs), other)
+    assert shared == alone
+    assert sum(count for count, _ in alone) > 0
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import shapely
+from src.GeoFlux.city import City
+from src.GeoFlux.stochastic_vector_field import ForceRules
+
+SQUARE = shapely.box(0, 0, 1, 1)
+
+
+def test_two_group_rules_from_a_table_run_identically():
+    table = {"white": {"white": 0.0005, "black": -0.001}, "black": {"white": 0.00005, "black": 0.0001}}
+    runs = []
+    for kwargs in ({}, {"rules": ForceRules.from_table(table), "populations": {"white": 40, "black": 8}}):
+        city = City(40, 8, SQUARE, seed=5, max_step_size=0.05, **kwargs)
+        city.populate()
+        for _ in range(3):
+            city.step()
+        runs.append(city.population)
+    assert np.array_equal(runs[0].x, runs[1].x)
+    assert np.array_equal(runs[0].y, runs[1].y)
+
+
+def test_per_group_noise_and_pull():
+    rules = ForceRules.from_table({"a": {"a": 0.001}, "b": {"c": -0.001}}, noise={"b": 0.2}, center_pull={"c": 0.0})
+    assert rules.groups == ("a", "b", "c")
+    assert rules.interaction[1, 2] == -0.001 and rules.interaction[2, 1] == 0.0
+    assert np.array_equal(rules.sigma(np.array([0, 1, 2])), [0.05, 0.2, 0.05])
+    assert np.array_equal(rules.pull(np.array([0, 2])), [0.001, 0.0])
+
+
+def test_rules_must_cover_every_group():
+    with pytest.raises(ValueError):
+        ForceRules(np.zeros((2, 3)))
+    with pytest.raises(ValueError):
+        City(None, None, SQUARE, populations={"white": 5, "asian": 5})
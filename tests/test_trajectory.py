@@ -0,0 +1,50 @@
+import os
+import numpy as np
+import pytest
+import shapely
+from src.GeoFlux.city import City
+from src.GeoFlux.trajectory import TrajectoryStore, load_checkpoint
+
+SQUARE = shapely.box(0, 0, 1, 1)
+
+
+def record(directory, wp, bp, seed, steps=2):
+    city = City(wp, bp, SQUARE, seed=seed, max_step_size=0.05)
+    city.populate()
+    city.record_trajectory(directory, chunk_steps=4)
+    for _ in range(steps):
+        city.step()
+    return city
+
+
+def test_create_replaces_an_existing_store(tmp_path):
+    record(tmp_path, 10, 2, seed=1)
+    city = record(tmp_path, 20, 2, seed=2)
+    store = TrajectoryStore(tmp_path)
+    assert len(store) == 3
+    assert np.array_equal(store.positions(-1)[:, 0], city.population.x)
+
+
+def test_checkpoint_round_trip(tmp_path):
+    city = record(tmp_path / "trajectory", 10, 2, seed=3)
+    city.save_checkpoint(tmp_path / "city.pkl")
+    restored = load_checkpoint(tmp_path / "city.pkl")
+    city.step()
+    restored.step()
+    assert np.array_equal(city.population.x, restored.population.x)
+
+
+def test_failed_metadata_write_keeps_the_store(tmp_path, monkeypatch):
+    record(tmp_path, 10, 2, seed=5)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    store = TrajectoryStore(tmp_path)
+    population = store.population(-1)
+    monkeypatch.setattr("src.GeoFlux.trajectory.json.dump", fail)
+    with pytest.raises(OSError):
+        store.append(population)
+    monkeypatch.undo()
+    assert len(TrajectoryStore(tmp_path)) == 3
+    assert sorted(os.listdir(tmp_path)) == ["codes_00000.npy", "positions_00000.npy", "trajectory.json"]